@@ -0,0 +1,125 @@
+"""Precompute collaborative top-N lists for every user in the ratings file.
+
+    python batch_recommend.py --out-dir batch_recommendations --top-n 20 --workers 8
+
+Users are split into blocks of --block-size. Each block is scored in a worker process
+as one matrix product against the item factors, with the same exclusions and tie order
+as the collaborative page ("All" categories). Each block is written as its own shard
+(shard_00012.parquet: user_id, rank, product_id, EstimateScore). Re-running with the
+same arguments resumes after a crash: blocks whose shard already exists are skipped.
+Read everything back with ``pd.read_parquet(out_dir)``.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from data_store import get_history_index, get_rating_log, positive_items
+from model_registry import SVD_FACTORS_DIR_ENV, collaborative_version, export_factors, get_catalog_blocks
+
+MANIFEST_FILE = "_manifest.json"  # leading underscore: skipped by pd.read_parquet(out_dir)
+
+
+def shard_path(out_dir, block):
+    return os.path.join(out_dir, f"shard_{block:05d}.parquet")
+
+
+def _load_models():
+    # Runs in the parent before the pool forks (children share its pages), and again
+    # in each worker as a no-op, or, where processes are spawned, as a memory-mapped
+    # load of the exported factors (SVD_FACTORS_DIR) rather than a copy per worker
+    get_catalog_blocks()
+    get_history_index()
+    get_rating_log()
+
+
+def score_block(task):
+    block, user_ids, top_n, out_dir = task
+    catalog, item_blocks = get_catalog_blocks()
+
+    exclude = [positive_items(user_id, min_rating=3) for user_id in user_ids]
+    results = item_blocks.top_k_many(user_ids, top_n, exclude)
+
+    counts = [len(positions) for positions, _ in results]
+    shard = pd.DataFrame({
+        'user_id': np.repeat(user_ids, counts),
+        'rank': np.concatenate([np.arange(1, n + 1) for n in counts]).astype(np.int16),
+        'product_id': catalog['product_id'].values[np.concatenate([p for p, _ in results]).astype(np.intp)],
+        'EstimateScore': np.concatenate([s for _, s in results]).round(2),
+    })
+
+    # Written under a hidden name, then renamed: a crash never leaves a partial shard behind
+    path = shard_path(out_dir, block)
+    tmp_path = os.path.join(out_dir, f".{os.path.basename(path)}.tmp")
+    shard.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return len(user_ids)
+
+
+def check_manifest(out_dir, manifest, restart):
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    if restart and os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    if os.path.exists(path):
+        with open(path) as f:
+            previous = json.load(f)
+        if previous != manifest:
+            raise SystemExit(f"{out_dir} holds a run with other settings ({previous}); "
+                             f"pass --restart to discard it")
+    with open(path, "w") as f:
+        json.dump(manifest, f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute collaborative top-N lists for every user")
+    parser.add_argument("--out-dir", default="batch_recommendations")
+    parser.add_argument("--top-n", type=int, default=20)
+    parser.add_argument("--block-size", type=int, default=2048, help="Users scored per matrix product / shard")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--restart", action="store_true", help="Discard shards of a previous run")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    _load_models()
+    user_ids = get_history_index().user_ids
+    n_blocks = -(-len(user_ids) // args.block_size)
+    check_manifest(args.out_dir, {
+        "top_n": args.top_n, "block_size": args.block_size,
+        "n_users": len(user_ids), "model_version": collaborative_version(),
+    }, args.restart)
+    print(f"Loaded {len(user_ids)} users in {time.perf_counter() - start:.1f}s")
+
+    tasks = [
+        (block, user_ids[block * args.block_size:(block + 1) * args.block_size], args.top_n, args.out_dir)
+        for block in range(n_blocks)
+        if not os.path.exists(shard_path(args.out_dir, block))
+    ]
+    print(f"{n_blocks - len(tasks)} of {n_blocks} shards already done, scoring {len(tasks)}")
+
+    # Workers share one memory-mapped copy of the factors; export them unless already done
+    factors_dir = None
+    if not os.environ.get(SVD_FACTORS_DIR_ENV):
+        factors_dir = tempfile.mkdtemp(prefix="svd_factors_", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+        export_factors(factors_dir)
+        os.environ[SVD_FACTORS_DIR_ENV] = factors_dir
+
+    start = time.perf_counter()
+    done = 0
+    try:
+        with Pool(args.workers, initializer=_load_models) as pool:
+            for n_users in pool.imap_unordered(score_block, tasks):
+                done += n_users
+                elapsed = time.perf_counter() - start
+                print(f"\r{done} users, {done / elapsed:.0f} users/s", end="", flush=True)
+    finally:
+        if factors_dir is not None:
+            shutil.rmtree(factors_dir, ignore_errors=True)
+    elapsed = time.perf_counter() - start
+    print(f"\nScored {done} users in {elapsed:.1f}s ({done / max(elapsed, 1e-9):.0f} users/s) into {args.out_dir}")
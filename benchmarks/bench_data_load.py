@@ -0,0 +1,57 @@
+"""Cold-load time and memory of the CSV vs. Parquet data paths.
+
+Each variant runs in a fresh interpreter so nothing is warm. Run from the project root
+after `python ingest.py`:
+
+    python benchmarks/bench_data_load.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+import pyarrow.parquet  # imported up front so only the data itself is measured
+import data_store
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+before = rss_mb()
+start = time.perf_counter()
+if {source!r} == "csv":
+    ratings, products = data_store.read_ratings_csv(), data_store.read_products_csv()
+else:
+    ratings, products = data_store.load_ratings(), data_store.load_products()
+elapsed = time.perf_counter() - start
+frames_mb = (ratings.memory_usage(deep=True).sum() + products.memory_usage(deep=True).sum()) / 2**20
+print(json.dumps({{"seconds": elapsed, "rss_mb": rss_mb() - before, "frames_mb": frames_mb}}))
+"""
+
+
+def cold_load(source, repeat=3):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(root=PROJECT_ROOT, source=source)],
+            capture_output=True, text=True, check=True,
+        )
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    # Best of N for time, memory is deterministic enough to take from the same run
+    return min(runs, key=lambda r: r["seconds"])
+
+
+if __name__ == "__main__":
+    results = {source: cold_load(source) for source in ("csv", "parquet")}
+    for source, r in results.items():
+        print(f"{source:8s} load {r['seconds']:.3f}s   RSS +{r['rss_mb']:.1f} MB   frames {r['frames_mb']:.1f} MB")
+    csv, parquet = results["csv"], results["parquet"]
+    print(f"speed-up x{csv['seconds'] / parquet['seconds']:.1f}, "
+          f"RSS {parquet['rss_mb'] - csv['rss_mb']:+.1f} MB, frames {parquet['frames_mb'] - csv['frames_mb']:+.1f} MB")
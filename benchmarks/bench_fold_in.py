@@ -0,0 +1,71 @@
+"""Check that folding ratings into the SVD user factors keeps what training learned.
+
+For a sample of trained users (uses surprise.pkl and the ratings table of the current
+directory):
+  * folding in their own history, rated as the model predicts it, must reproduce the
+    trained top-k exactly (the script exits with status 1 otherwise);
+  * folding in one new rating reports the overlap of the new top-k with the trained one,
+    the change of |pu| and the time per fold.
+Run from the project root:
+
+    python benchmarks/bench_fold_in.py --users 200 --k 10
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from cf_engine import top_k_indices
+from data_store import get_history_index
+from model_registry import FOLD_IN_NOISE_VAR, get_svd_scorer
+
+
+def raw_top_k(scorer, user_id, k):
+    # Unclipped estimates, so that ties at the rating scale's ends do not hide a reordering
+    pu, bu = scorer.user_factors(user_id)
+    return top_k_indices(scorer.qi @ pu + scorer.bi + bu, k)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rating", type=float, default=5.0, help="The new rating folded in")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    scorer = get_svd_scorer()
+    history = get_history_index()
+    rng = np.random.default_rng(args.seed)
+    user_ids = rng.choice(scorer.user_ids, size=min(args.users, len(scorer.user_ids)), replace=False)
+
+    changed, overlaps, norm_ratios, seconds = 0, [], [], 0.0
+    for user_id in user_ids:
+        trained = raw_top_k(scorer, user_id, args.k)
+        pu, bu = scorer.user_factors(user_id)
+
+        product_ids, _ = history.history(user_id)
+        predicted = scorer.global_mean + bu + scorer.bi + scorer.qi @ pu if scorer.biased else scorer.qi @ pu
+        inner = scorer.item_index(product_ids)
+        known = inner >= 0
+        scorer.fold_in(user_id, product_ids[known], predicted[inner[known]], noise_var=FOLD_IN_NOISE_VAR)
+        changed += not np.array_equal(raw_top_k(scorer, user_id, args.k), trained)
+
+        item = rng.integers(scorer.n_items)
+        start = time.perf_counter()
+        scorer.fold_in(user_id, scorer.item_ids[item:item + 1], [args.rating], noise_var=FOLD_IN_NOISE_VAR)
+        seconds += time.perf_counter() - start
+        overlaps.append(len(np.intersect1d(raw_top_k(scorer, user_id, args.k), trained)) / args.k)
+        norm_ratios.append(np.linalg.norm(scorer.user_factors(user_id)[0]) / max(np.linalg.norm(pu), 1e-12))
+    scorer.forget_folded()
+
+    print(f"{len(user_ids)} users, noise variance {FOLD_IN_NOISE_VAR}")
+    print(f"unchanged history: top-{args.k} changed for {changed} users")
+    print(f"one new rating of {args.rating:g}: top-{args.k} overlap {np.mean(overlaps):.2f} "
+          f"(min {np.min(overlaps):.2f}), |pu| x{np.median(norm_ratios):.2f} (median), "
+          f"{1000 * seconds / len(user_ids):.3f} ms per fold")
+    sys.exit(1 if changed else 0)
@@ -0,0 +1,41 @@
+"""Recall vs. latency of the MIPS index against the exact collaborative scan.
+
+Run from the project root (uses surprise.pkl):
+
+    python benchmarks/bench_mips.py --users 500 --k 10
+
+"widened" is the share of users whose n_probe partitions held fewer than k items, so
+that the next closest partitions were probed too, and "probed" the mean partition count.
+Switch the collaborative page to the index with CF_MIPS_PROBES=<n_probe> once the
+reported recall at that setting is acceptable and it beats the exact scan.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from cf_engine import MIPSIndex, mips_recall_report
+from model_registry import get_svd_scorer
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--lists", type=int, default=None, help="Number of partitions (default sqrt(n_items))")
+    args = parser.parse_args()
+
+    scorer = get_svd_scorer()
+    start = time.perf_counter()
+    index = MIPSIndex(scorer, n_lists=args.lists)
+    print(f"{scorer.n_items} items, {len(index.centroids)} partitions, built in {time.perf_counter() - start:.1f}s")
+
+    rng = np.random.default_rng(0)
+    user_ids = rng.choice(scorer.user_ids, size=min(args.users, len(scorer.user_ids)), replace=False)
+    print(f"{'n_probe':>8} {'recall@' + str(args.k):>10} {'ms/user':>9} {'exact ms':>9} {'widened':>8} {'probed':>7}")
+    for row in mips_recall_report(index, user_ids, k=args.k):
+        print(f"{row['n_probe']:>8} {row['recall']:>10.3f} {row['ms_per_user']:>9.3f} {row['exact_ms_per_user']:>9.3f} "
+              f"{row['widened']:>8.1%} {row['mean_probed']:>7.1f}")
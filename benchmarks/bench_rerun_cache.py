@@ -0,0 +1,52 @@
+"""Per-rerun cost of fetching the page data: st.cache_data vs. the shared data_store tables.
+
+st.cache_data pickles the cached value and unpickles a fresh copy on every hit, so each
+rerun of a page paid for a full deserialization of the ratings and products frames.
+The data_store getters hand back the same read-only objects by reference. Run from the
+project root:
+
+    python benchmarks/bench_rerun_cache.py --reruns 20
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streamlit as st
+
+import data_store
+
+
+@st.cache_data
+def load_data():
+    # What each page used to do before the shared data layer
+    user_rating = data_store.load_ratings()
+    products = data_store.load_products()
+    return user_rating, products, data_store.ProductIndex(products), data_store.UserHistoryIndex(user_rating)
+
+
+def shared_data():
+    return (data_store.get_ratings(), data_store.get_products(),
+            data_store.get_product_index(), data_store.get_history_index())
+
+
+def per_rerun_ms(fetch, reruns):
+    fetch()  # first call fills the cache, reruns only hit it
+    start = time.perf_counter()
+    for _ in range(reruns):
+        fetch()
+    return (time.perf_counter() - start) / reruns * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=20)
+    args = parser.parse_args()
+
+    before = per_rerun_ms(load_data, args.reruns)
+    after = per_rerun_ms(shared_data, args.reruns)
+    print(f"st.cache_data   {before:9.3f} ms/rerun")
+    print(f"shared tables   {after:9.3f} ms/rerun")
+    print(f"speed-up x{before / max(after, 1e-9):.0f}")
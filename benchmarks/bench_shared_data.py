@@ -0,0 +1,64 @@
+"""Resident memory of per-page data copies vs. the shared data_store tables.
+
+"per-page" reproduces what the four pages used to hold: one ratings/products pair
+per page's cached load_data() plus the EDA ratings/products join. "shared" builds
+every table once through data_store. Each variant runs in a fresh interpreter.
+Run from the project root:
+
+    python benchmarks/bench_shared_data.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = """
+import json, sys
+sys.path.insert(0, {root!r})
+import pandas as pd
+import pyarrow.parquet  # imported up front so only the data itself is measured
+import data_store
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+before = rss_mb()
+if {variant!r} == "per-page":
+    copies = []
+    for page in range(4):
+        ratings, products = data_store.load_ratings(), data_store.load_products()
+        copies.append((ratings, products, data_store.ProductIndex(products)))
+        if page < 2:
+            copies.append(data_store.UserHistoryIndex(ratings))
+    overall = pd.merge(ratings, products, on='product_id', how='left')
+    report = []
+else:
+    data_store.get_ratings(), data_store.get_products()
+    data_store.get_product_index(), data_store.get_history_index()
+    data_store.get_overall()
+    report = data_store.memory_report()
+print(json.dumps({{"rss_mb": rss_mb() - before, "tables": report}}))
+"""
+
+
+def measure(variant):
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(root=PROJECT_ROOT, variant=variant)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    per_page, shared = measure("per-page"), measure("shared")
+
+    print(f"{'table':>14} {'rows':>10} {'MB':>9}")
+    for name, rows, nbytes in shared["tables"]:
+        print(f"{name:>14} {rows if rows is not None else '-':>10} {nbytes / 2**20:>9.1f}")
+    print(f"per-page RSS +{per_page['rss_mb']:.1f} MB   shared RSS +{shared['rss_mb']:.1f} MB   "
+          f"saved {per_page['rss_mb'] - shared['rss_mb']:.1f} MB")
@@ -0,0 +1,70 @@
+"""Memory of N scoring workers: each unpickling surprise.pkl vs. mapping exported factors.
+
+Every worker is a fresh interpreter that loads the collaborative catalog blocks, either
+from surprise.pkl (its own private copy of the factors) or from the files written by
+export_factors.py (pages shared through the OS page cache). Reports the summed
+proportional set size (Pss), which splits each shared page between the processes
+mapping it. Linux only. Run from the project root:
+
+    python benchmarks/bench_shared_factors.py --workers 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from model_registry import SVD_FACTORS_DIR_ENV, export_factors
+
+_WORKER = """
+import sys
+sys.path.insert(0, {root!r})
+from model_registry import get_catalog_blocks
+catalog, item_blocks = get_catalog_blocks()
+item_blocks.top_k(0, 10)  # touch every factor page, as a scoring request would
+print("ready", flush=True)
+sys.stdin.read()  # stay alive until the parent has measured every worker
+"""
+
+
+def pss_mb(pid):
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1]) / 1024
+
+
+def measure(workers, factors_dir=None):
+    env = dict(os.environ)
+    env.pop(SVD_FACTORS_DIR_ENV, None)
+    if factors_dir is not None:
+        env[SVD_FACTORS_DIR_ENV] = factors_dir
+    procs = [
+        subprocess.Popen([sys.executable, "-c", _WORKER.format(root=PROJECT_ROOT)],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=env)
+        for _ in range(workers)
+    ]
+    try:
+        for proc in procs:
+            proc.stdout.readline()
+        return sum(pss_mb(proc.pid) for proc in procs)
+    finally:
+        for proc in procs:
+            proc.stdin.close()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    private = measure(args.workers)
+    with tempfile.TemporaryDirectory(prefix="svd_factors_") as factors_dir:
+        export_factors(factors_dir)
+        shared = measure(args.workers, factors_dir)
+    print(f"{args.workers} workers  pickle Pss {private:.1f} MB   mapped Pss {shared:.1f} MB   "
+          f"saved {private - shared:.1f} MB")
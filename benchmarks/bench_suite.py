@@ -0,0 +1,173 @@
+"""End-to-end timings of the app's hot paths on synthetic data, saved as JSON.
+
+For every --ratings scale a dataset and stand-in models are generated once with
+synthetic_data.py (cached under --data-dir), then a fresh interpreter inside that
+directory times:
+
+    load_data                 cold load of the shared tables the pages use (ratings, products, indexes, leaderboard)
+    load_models               cold load of the collaborative blocks and the content model
+    collab_filtering          per request, random users, "All" and single categories
+    content_based_filtering   per request, random products
+    eda_aggregates            the EDA page's per-rerun aggregates (category counts, user activity, stats)
+
+Run from the project root, then compare a later run against the saved one:
+
+    python benchmarks/bench_suite.py --ratings 10000 100000 1000000 --out bench_results.json
+    python benchmarks/bench_suite.py --ratings 10000 100000 1000000 --compare bench_results.json
+
+--compare exits with status 1 when a timing got slower than --tolerance times the old one.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import synthetic_data
+
+
+def _ms(start):
+    return (time.perf_counter() - start) * 1000
+
+
+def _latencies(name, call, args, warm_up=5):
+    for arg in args[:warm_up]:  # first calls build lazy per-process state
+        call(*arg)
+    times = []
+    for arg in args:
+        start = time.perf_counter()
+        call(*arg)
+        times.append(_ms(start))
+    return {f"{name}_mean_ms": float(np.mean(times)),
+            f"{name}_p50_ms": float(np.percentile(times, 50)),
+            f"{name}_p95_ms": float(np.percentile(times, 95))}
+
+
+def eda_aggregates(ratings, products):
+    # Same computations as eda.py, without the charts
+    products['sub_category'].value_counts()
+    products['price'].max(), products['price'].min(), products['price'].mean()
+    user_info = ratings[['user_id', 'user']].drop_duplicates()
+    user_counts = ratings['user_id'].value_counts().reset_index()
+    user_counts.columns = ['user_id', 'activity_count']
+    user_counts = user_counts.merge(user_info, on='user_id', how='left')
+    user_counts.sort_values(by="activity_count", ascending=False).head(10)
+    user_counts.sort_values(by="activity_count", ascending=True).head(10)
+    for df in (ratings, products):
+        df['rating'].max(), df['rating'].min(), df['rating'].mean(), sorted(df['rating'].unique())
+
+
+def probe(n_requests, seed):
+    """Timings of one dataset; runs inside its directory, in a fresh interpreter."""
+    import data_store
+    import model_registry
+    import recommender
+
+    timings = {}
+    start = time.perf_counter()
+    ratings, products = data_store.get_ratings(), data_store.get_products()
+    data_store.get_product_index(), data_store.get_history_index(), data_store.get_leaderboard()
+    timings["load_data_ms"] = _ms(start)
+
+    start = time.perf_counter()
+    catalog, item_blocks = model_registry.get_catalog_blocks()
+    model_registry.get_tfidf_matrix(), model_registry.get_content_index(), model_registry.get_neighbour_table()
+    timings["load_models_ms"] = _ms(start)
+
+    rng = np.random.default_rng(seed)
+    users = rng.choice(ratings['user_id'].values, n_requests)
+    categories = np.array(['All'] + list(item_blocks.blocks), dtype=object)
+    category = np.where(rng.random(n_requests) < 0.5, 'All', rng.choice(categories, n_requests))
+    timings.update(_latencies("collab_filtering", recommender.collab_filtering,
+                              [(int(u), 5, c) for u, c in zip(users, category)]))
+    product_ids = rng.choice(products['product_id'].values, n_requests)
+    timings.update(_latencies("content_based_filtering", recommender.content_based_filtering,
+                              [(int(p), 5) for p in product_ids]))
+
+    runs = []
+    for _ in range(3):
+        start = time.perf_counter()
+        eda_aggregates(ratings, products)
+        runs.append(_ms(start))
+    timings["eda_aggregates_ms"] = float(np.median(runs))
+
+    timings["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return timings
+
+
+def run_scale(n_ratings, data_dir, n_requests, seed):
+    directory = os.path.join(data_dir, f"ratings_{n_ratings}")
+    params = synthetic_data.read_params(directory)
+    if params is None or params["n_ratings"] != n_ratings or params["seed"] != seed:
+        start = time.perf_counter()
+        params = synthetic_data.write_dataset(directory, n_ratings, seed=seed)
+        print(f"Generated {directory} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--probe", "--requests", str(n_requests), "--seed", str(seed)],
+        cwd=directory, capture_output=True, text=True, check=True,
+    )
+    return {**params, "timings": json.loads(out.stdout.strip().splitlines()[-1])}
+
+
+def compare(results, baseline, tolerance):
+    """Print new/old ratios for every timing of both runs; returns the names that regressed."""
+    old_runs = {run["n_ratings"]: run["timings"] for run in baseline["runs"]}
+    regressions = []
+    for run in results["runs"]:
+        old = old_runs.get(run["n_ratings"])
+        if old is None:
+            continue
+        for name, value in run["timings"].items():
+            if name in old and old[name] > 0:
+                ratio = value / old[name]
+                flag = "  REGRESSION" if ratio > tolerance else ""
+                print(f"{run['n_ratings']:>10} {name:>34} {old[name]:>10.2f} -> {value:>10.2f}  x{ratio:.2f}{flag}")
+                if flag:
+                    regressions.append(f"{run['n_ratings']}:{name}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ratings", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--data-dir", default=os.path.join(PROJECT_ROOT, "benchmarks", "data"))
+    parser.add_argument("--requests", type=int, default=200, help="Recommendation requests timed per scale")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Slow-down ratio reported as a regression")
+    parser.add_argument("--probe", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(probe(args.requests, args.seed)))
+        sys.exit()
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+        "runs": [],
+    }
+    for n_ratings in args.ratings:
+        run = run_scale(n_ratings, args.data_dir, args.requests, args.seed)
+        results["runs"].append(run)
+        print(f"{n_ratings:>10} ratings  " + "  ".join(f"{k} {v:.2f}" for k, v in run["timings"].items()))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
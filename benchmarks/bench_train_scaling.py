@@ -0,0 +1,57 @@
+"""ALS training time on 1..N threads, with the speed-up over one thread.
+
+Trains mf_trainer.ALSTrainer on the ratings table of the current directory (or, with
+--ratings, on a synthetic dataset from synthetic_data.py) once per thread count and
+solver, and reports the seconds per sweep, the speed-up and the final training RMSE.
+Run from the project root:
+
+    python benchmarks/bench_train_scaling.py --threads 1 2 4 8 --ratings 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mf_trainer import SOLVERS, ALSTrainer, RatingMatrix, train_rmse, training_ratings
+
+
+def synthetic_matrix(n_ratings, seed):
+    import numpy as np
+
+    import synthetic_data
+
+    rng = np.random.default_rng(seed)
+    n_products, n_users = synthetic_data.default_sizes(n_ratings)
+    products = synthetic_data.generate_products(n_products, rng)
+    ratings = synthetic_data.generate_ratings(n_ratings, n_users, products['product_id'].values, rng)
+    return RatingMatrix(ratings['user_id'].values, ratings['product_id'].values, ratings['rating'].values)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count()])
+    parser.add_argument("--solvers", nargs="+", choices=SOLVERS, default=list(SOLVERS))
+    parser.add_argument("--ratings", type=int, help="Synthetic ratings instead of the ratings table")
+    parser.add_argument("--factors", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    matrix = synthetic_matrix(args.ratings, args.seed) if args.ratings else training_ratings()
+    print(f"{matrix.n_ratings} ratings, {len(matrix.user_ids)} users, {len(matrix.item_ids)} products, "
+          f"{args.factors} factors, {os.cpu_count()} cores")
+    print(f"{'solver':>6} {'threads':>8} {'s/sweep':>9} {'speed-up':>9} {'train RMSE':>11}")
+    for solver in args.solvers:
+        baseline = None
+        for n_threads in args.threads:
+            trainer = ALSTrainer(args.factors, args.iterations, solver=solver, n_threads=n_threads, seed=args.seed)
+            start = time.perf_counter()
+            scorer = trainer.fit(matrix)
+            per_sweep = (time.perf_counter() - start) / args.iterations
+            baseline = baseline or per_sweep
+            rmse = train_rmse(matrix, scorer.pu, scorer.qi, scorer.bu, scorer.bi, scorer.biased)
+            print(f"{solver:>6} {n_threads:>8} {per_sweep:>9.3f} {baseline / per_sweep:>8.2f}x {rmse:>11.4f}")
@@ -0,0 +1,169 @@
+"""Synthetic Shopee-like dataset and stand-in models for benchmarking.
+
+Writes into ``--out-dir`` everything the app reads from the project root:
+
+    Products_ThoiTrangNam_downsize.csv   product_id, product_name, sub_category, price, rating,
+                                         image, link, description_clean (plus the unnamed index)
+    Products_ThoiTrangNam_rating.csv     user_id, product_id, rating, user
+    surprise.pkl                         Surprise SVD fitted on the ratings
+    tfidf_matrix.npz / gensim.pkl        TF-IDF rows of the products and the fitted NearestNeighbors
+    *.parquet, user_activity.parquet     the `python ingest.py` outputs
+
+User activity and product popularity follow a long-tailed (Zipf-like) distribution,
+ratings are skewed towards 5 stars and some user names are masked ("t*****9") like
+the real data. The same arguments and seed always produce the same files.
+
+    python benchmarks/synthetic_data.py --out-dir benchmarks/data/100k --ratings 100000
+"""
+import argparse
+import json
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_store
+
+DATASET_FILE = "dataset.json"
+
+SUB_CATEGORIES = [
+    "Áo Khoác", "Áo Vest và Blazer", "Áo Hoodie, Áo Len & Áo Nỉ", "Áo", "Áo Ba Lỗ",
+    "Quần Jeans", "Quần Dài/Quần Âu", "Quần Short", "Đồ Lót", "Đồ Ngủ", "Đồ Bộ",
+    "Vớ/Tất", "Trang Phục Truyền Thống", "Đồ Hóa Trang", "Trang Sức Nam", "Kính Mắt Nam", "Khác",
+]
+_CATEGORY_WORDS = [
+    "ao khoac gio du chong nuoc", "vest blazer cong so lich lam", "hoodie len ni ni bong ni",
+    "ao thun polo so mi tay ngan", "ba lo sat nach the thao", "quan jean ong dung rach",
+    "quan tay au ong suong kaki", "quan short dui the thao", "quan lot sip boxer cotton",
+    "do ngu pijama lua", "do bo the thao mac nha", "tat vo co ngan co cao",
+    "ao dai truyen thong ba ba", "hoa trang cosplay halloween", "day chuyen nhan vong tay bac",
+    "kinh mat gong chong tia uv", "phu kien khac qua tang",
+]
+_SHARED_WORDS = ("nam thoi trang cao cap gia re hang chat luong dep form rong slim fit "
+                 "den trang xanh do xam be nau size m l xl xxl cotton vai mem thoang mat").split()
+
+
+def _zipf_weights(n, exponent, rng):
+    # Long-tailed popularity over n ids, shuffled so rank is unrelated to id
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return rng.permutation(weights / weights.sum())
+
+
+def default_sizes(n_ratings):
+    """(n_products, n_users) in roughly the proportions of the real dataset."""
+    return int(np.clip(n_ratings // 20, 1000, 50000)), max(100, n_ratings // 2)
+
+
+def generate_products(n_products, rng):
+    category = rng.integers(0, len(SUB_CATEGORIES), n_products)
+    category_words = [words.split() for words in _CATEGORY_WORDS]
+    descriptions = [
+        " ".join(rng.choice(category_words[c], 4).tolist() + rng.choice(_SHARED_WORDS, 12).tolist())
+        for c in category
+    ]
+    product_ids = np.sort(rng.choice(np.arange(1, n_products * 20), n_products, replace=False))
+    rating = np.where(rng.random(n_products) < 0.4, 0.0, rng.uniform(4.0, 5.0, n_products).round(1))
+    return pd.DataFrame({
+        'product_id': product_ids,
+        'product_name': [d[:60].title() for d in descriptions],
+        'sub_category': np.array(SUB_CATEGORIES, dtype=object)[category],
+        'price': (np.exp(rng.normal(12, 0.8, n_products)) // 1000 * 1000).astype(np.int64),
+        'rating': rating,
+        'image': [f"https://cf.shopee.vn/file/{pid:x}" for pid in product_ids],
+        'link': [f"https://shopee.vn/product/{pid}" for pid in product_ids],
+        'description_clean': descriptions,
+    })
+
+
+def generate_ratings(n_ratings, n_users, product_ids, rng):
+    user_ids = rng.choice(n_users, n_ratings, p=_zipf_weights(n_users, 0.8, rng))
+    products = rng.choice(product_ids, n_ratings, p=_zipf_weights(len(product_ids), 0.9, rng))
+    stars = rng.choice(np.arange(1, 6), n_ratings, p=[0.04, 0.02, 0.05, 0.12, 0.77])
+    # One display name per user; about 1 in 4 is masked like "t*****9"
+    names = np.array([
+        f"{name[0]}*****{name[-1]}" if masked else name
+        for name, masked in zip((f"user{u}" for u in range(n_users)), rng.random(n_users) < 0.25)
+    ], dtype=object)
+    return pd.DataFrame({'user_id': user_ids, 'product_id': products, 'rating': stars, 'user': names[user_ids]})
+
+
+def train_svd(ratings, n_factors=50, n_epochs=5, seed=0):
+    from surprise import SVD, Dataset, Reader
+
+    data = Dataset.load_from_df(ratings[['user_id', 'product_id', 'rating']], Reader(rating_scale=(1, 5)))
+    algo = SVD(n_factors=n_factors, n_epochs=n_epochs, random_state=seed)
+    algo.fit(data.build_full_trainset())
+    return algo
+
+
+def train_content(products):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.neighbors import NearestNeighbors
+
+    tfidf_matrix = TfidfVectorizer().fit_transform(products['description_clean'])
+    return tfidf_matrix, NearestNeighbors(metric='cosine', algorithm='brute').fit(tfidf_matrix)
+
+
+def write_dataset(directory, n_ratings, n_products=None, n_users=None, n_factors=50, n_epochs=5, seed=0):
+    """Generate the dataset and models into ``directory``; returns the parameters recorded in dataset.json."""
+    def path(name):
+        return os.path.join(directory, name)
+
+    default_products, default_users = default_sizes(n_ratings)
+    params = {
+        "n_ratings": n_ratings, "n_products": n_products or default_products, "n_users": n_users or default_users,
+        "n_factors": n_factors, "n_epochs": n_epochs, "seed": seed,
+    }
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    products = generate_products(params["n_products"], rng)
+    ratings = generate_ratings(n_ratings, params["n_users"], products['product_id'].values, rng)
+    products.to_csv(path(data_store.PRODUCTS_CSV))
+    ratings.to_csv(path(data_store.RATINGS_CSV), index=False)
+    data_store.ingest(path(data_store.RATINGS_CSV), path(data_store.PRODUCTS_CSV),
+                      path(data_store.RATINGS_PARQUET), path(data_store.PRODUCTS_PARQUET),
+                      path(data_store.USER_ACTIVITY_PARQUET))
+
+    with open(path("surprise.pkl"), "wb") as f:
+        pickle.dump(train_svd(ratings, n_factors, n_epochs, seed), f)
+    tfidf_matrix, content_model = train_content(products)
+    scipy.sparse.save_npz(path("tfidf_matrix.npz"), tfidf_matrix)
+    with open(path("gensim.pkl"), "wb") as f:
+        pickle.dump(content_model, f)
+
+    # Written last: its presence marks a complete dataset
+    with open(path(DATASET_FILE), "w") as f:
+        json.dump(params, f)
+    return params
+
+
+def read_params(directory):
+    """Parameters of the dataset in ``directory``, None if there is no complete one."""
+    try:
+        with open(os.path.join(directory, DATASET_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset and stand-in models")
+    parser.add_argument("--out-dir", required=True)
+    parser.add_argument("--ratings", type=int, default=100_000)
+    parser.add_argument("--products", type=int, help="Default: ratings / 20, between 1K and 50K")
+    parser.add_argument("--users", type=int, help="Default: ratings / 2")
+    parser.add_argument("--factors", type=int, default=50)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    params = write_dataset(args.out_dir, args.ratings, args.products, args.users, args.factors, args.epochs, args.seed)
+    print(f"Wrote {params} to {args.out_dir} in {time.perf_counter() - start:.1f}s")
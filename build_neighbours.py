@@ -0,0 +1,22 @@
+import argparse
+import time
+
+import scipy.sparse
+
+from content_engine import build_neighbour_table, save_neighbour_table
+
+# Offline step: precompute content-based neighbours for every product.
+# Re-run whenever tfidf_matrix.npz is rebuilt.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the item-to-item neighbour table from tfidf_matrix.npz")
+    parser.add_argument("--matrix", default="tfidf_matrix.npz")
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--neighbours", type=int, default=50)
+    parser.add_argument("--memory-mb", type=int, default=256, help="Size of one dense similarity block")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    tfidf_matrix = scipy.sparse.load_npz(args.matrix)
+    indices, distances = build_neighbour_table(tfidf_matrix, args.neighbours, args.memory_mb * 2**20)
+    save_neighbour_table(indices, distances, args.out_dir)
+    print(f"Built {indices.shape[0]} x {indices.shape[1]} neighbour table in {time.perf_counter() - start:.1f}s")
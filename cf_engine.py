@@ -0,0 +1,580 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse
+
+
+# === 🧮 Vectorized SVD scoring ===
+class SVDScorer:
+    """Scores items for a user straight from the factors of a trained surprise SVD.
+
+    ``model.predict`` is one Python call per (user, item) pair; here the whole
+    catalog is scored with a single ``qi @ pu`` matrix-vector product and the
+    same bias / fallback / clipping rules surprise applies.
+    """
+
+    def __init__(self, pu, qi, bu, bi, global_mean, user_ids, item_ids,
+                 rating_scale=(1, 5), biased=True, user_lookup=None, item_lookup=None):
+        self.pu = np.asarray(pu, dtype=np.float64)
+        self.qi = np.asarray(qi, dtype=np.float64)
+        self.bu = np.asarray(bu, dtype=np.float64)
+        self.bi = np.asarray(bi, dtype=np.float64)
+        self.global_mean = float(global_mean)
+        self.rating_scale = rating_scale
+        self.biased = biased
+
+        # Raw ids in inner-id order, plus sorted lookups raw id -> inner id
+        self.user_ids = np.asarray(user_ids)
+        self.item_ids = np.asarray(item_ids)
+        self._user_index = _IdLookup(self.user_ids, *(user_lookup or ()))
+        self._item_index = _IdLookup(self.item_ids, *(item_lookup or ()))
+
+        # raw user id -> (pu, bu) updated by ``fold_in``; takes precedence over the trained factors
+        self._folded = {}
+        # raw user id -> times its factors were changed by ``fold_in`` / ``forget_folded``
+        self._fold_generations = {}
+        self._fold_lock = threading.Lock()
+        self._prior_variance = None
+
+    @classmethod
+    def from_surprise(cls, model):
+        trainset = model.trainset
+        return cls(
+            pu=model.pu,
+            qi=model.qi,
+            bu=model.bu,
+            bi=model.bi,
+            global_mean=trainset.global_mean,
+            user_ids=_raw_ids_in_inner_order(trainset._raw2inner_id_users),
+            item_ids=_raw_ids_in_inner_order(trainset._raw2inner_id_items),
+            rating_scale=trainset.rating_scale,
+            biased=getattr(model, "biased", True),
+        )
+
+    _ARRAYS = ("pu", "qi", "bu", "bi", "user_ids", "item_ids")
+
+    def save(self, directory, **metadata):
+        """Write the factors, raw ids and id lookups as .npy files ``load`` can memory-map.
+
+        ``metadata`` (e.g. the model version) is stored alongside and returned by ``load``.
+        """
+        os.makedirs(directory, exist_ok=True)
+        arrays = {name: getattr(self, name) for name in self._ARRAYS}
+        for prefix, lookup in (("user", self._user_index), ("item", self._item_index)):
+            arrays[f"{prefix}_order"], arrays[f"{prefix}_sorted_ids"] = lookup.order, lookup.sorted_ids
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), _mappable(array))
+        with open(os.path.join(directory, "scorer.json"), "w") as f:
+            json.dump({"global_mean": self.global_mean, "rating_scale": list(self.rating_scale),
+                       "biased": self.biased, **metadata}, f)
+
+    @classmethod
+    def load(cls, directory):
+        """(scorer, metadata) backed by read-only memory maps of the files written by ``save``.
+
+        Every process loading the same directory shares one page-cache copy of the factors.
+        """
+        with open(os.path.join(directory, "scorer.json")) as f:
+            metadata = json.load(f)
+
+        def mapped(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+
+        scorer = cls(
+            **{name: mapped(name) for name in cls._ARRAYS},
+            global_mean=metadata.pop("global_mean"),
+            rating_scale=tuple(metadata.pop("rating_scale")),
+            biased=metadata.pop("biased"),
+            user_lookup=(mapped("user_order"), mapped("user_sorted_ids")),
+            item_lookup=(mapped("item_order"), mapped("item_sorted_ids")),
+        )
+        return scorer, metadata
+
+    @property
+    def n_items(self):
+        return len(self.item_ids)
+
+    def user_index(self, user_id):
+        # Inner id of a raw user id, -1 if the model never saw the user
+        return int(self._user_index.get_indexer([user_id])[0])
+
+    def item_index(self, product_ids):
+        # Inner ids of raw product ids, -1 for products unknown to the model
+        return self._item_index.get_indexer(np.asarray(product_ids))
+
+    def user_factors(self, user_id):
+        """(pu, bu) scoring ``user_id``: folded-in, else trained; None when the model cannot personalise."""
+        folded = self._folded.get(user_id)
+        if folded is not None:
+            return folded
+        u = self.user_index(user_id)
+        return (self.pu[u], self.bu[u]) if u >= 0 else None
+
+    def fold_in(self, user_id, product_ids, ratings, noise_var=1.0):
+        """Update ``user_id``'s factors with ratings the model was not trained on, item factors fixed.
+
+        A MAP estimate under a Gaussian prior centred on the user's trained (pu, bu), or on
+        zero for users the model never saw, with the spread of the trained factors: a few
+        new ratings nudge a known user instead of replacing what training learned. Replaces
+        any earlier fold of the user, so pass all of their new ratings. Ratings of products
+        unknown to the model are ignored; returns how many ratings were used.
+        """
+        inner = self.item_index(product_ids)
+        known = inner >= 0
+        factors = None
+        if known.any():
+            u = self.user_index(user_id)
+            factors = fold_in_factors(
+                self.qi[inner[known]], self.bi[inner[known]], np.asarray(ratings, dtype=np.float64)[known],
+                self.global_mean, noise_var / self.prior_variance(),
+                prior=(self.pu[u], self.bu[u]) if u >= 0 else None, biased=self.biased,
+            )
+        # Factors first, generation after: a reader seeing the new generation scores the new factors
+        with self._fold_lock:
+            if factors is None:
+                self._folded.pop(user_id, None)
+            else:
+                self._folded[user_id] = factors
+            self._fold_generations[user_id] = self.fold_generation(user_id) + 1
+        return int(known.sum())
+
+    def prior_variance(self):
+        # Per-factor variance of the trained user factors, the user bias' variance last
+        if self._prior_variance is None:
+            variance = np.append(np.mean(np.square(self.pu), axis=0), np.var(self.bu) if self.biased else 1.0)
+            self._prior_variance = np.maximum(variance, 1e-6)
+        return self._prior_variance
+
+    def fold_generation(self, user_id):
+        """Counter of the changes to ``user_id``'s factors since loading: 0 while they are the trained ones."""
+        return self._fold_generations.get(user_id, 0)
+
+    def forget_folded(self):
+        """Drop every fold-in: users are scored from their trained factors again."""
+        with self._fold_lock:
+            folded, self._folded = list(self._folded), {}
+            for user_id in folded:
+                self._fold_generations[user_id] += 1
+
+    def score_all(self, user_id):
+        """Estimated rating of ``user_id`` for every known item, in inner-id order."""
+        return self.score_factors(user_id, self.qi, self.bi)
+
+    def score_factors(self, user_id, qi, bi):
+        """Estimated ratings against a block of item factor rows ``qi`` / biases ``bi``."""
+        factors = self.user_factors(user_id)
+        if factors is None:
+            est = np.full(len(qi), self.global_mean)
+            if self.biased:
+                est += bi
+        elif self.biased:
+            pu, bu = factors
+            est = qi @ pu + bi + (self.global_mean + bu)
+        else:
+            est = qi @ factors[0]
+        return self._clip(est)
+
+    def score_factors_many(self, user_ids, qi, bi):
+        """``score_factors`` for a block of users at once: one ``(n_users, n_items)`` matrix product."""
+        pu, bu, known = self._user_factor_rows(np.asarray(user_ids))
+        est = np.empty((len(known), len(qi)))
+        if self.biased:
+            est[known] = pu @ qi.T + bi + (self.global_mean + bu)[:, None]
+            est[~known] = self.global_mean + bi
+        else:
+            est[known] = pu @ qi.T
+            est[~known] = self.global_mean
+        return self._clip(est)
+
+    def _user_factor_rows(self, user_ids):
+        # (pu, bu) rows of the users the model can personalise, and the mask of which ones they are
+        u = self._user_index.get_indexer(user_ids)
+        known = u >= 0
+        pu, bu = self.pu[u[known]], self.bu[u[known]]
+        folded = [self._folded.get(user_id) for user_id in user_ids.tolist()] if self._folded else []
+        if any(factors is not None for factors in folded):
+            all_pu, all_bu = np.zeros((len(u), self.pu.shape[1])), np.zeros(len(u))
+            all_pu[known], all_bu[known] = pu, bu
+            for i, factors in enumerate(folded):
+                if factors is not None:
+                    all_pu[i], all_bu[i] = factors
+                    known[i] = True
+            pu, bu = all_pu[known], all_bu[known]
+        return pu, bu, known
+
+    def score_items(self, user_id, product_ids):
+        """Estimated ratings for arbitrary raw product ids, same as ``model.predict``."""
+        factors = self.user_factors(user_id)
+        inner_items = self.item_index(product_ids)
+        known_item = inner_items >= 0
+
+        # Unknown items fall back exactly like surprise does
+        est = np.full(len(inner_items), self.global_mean)
+        if self.biased and factors is not None:
+            est += factors[1]
+        if self.biased or factors is not None:
+            est[known_item] = self.score_all(user_id)[inner_items[known_item]]
+        return self._clip(est)
+
+    def _clip(self, est):
+        lower, higher = self.rating_scale
+        return np.clip(est, lower, higher)
+
+
+class _IdLookup:
+    """raw id -> inner id via ``searchsorted`` on the ids in sorted order.
+
+    Unlike a hash table, the lookup is just two arrays, so it can live in a memory map
+    shared by every process. Passing a saved ``order`` / ``sorted_ids`` skips the sort.
+    """
+
+    def __init__(self, ids, order=None, sorted_ids=None):
+        self.order = np.argsort(ids, kind='stable') if order is None else order
+        self.sorted_ids = ids[self.order] if sorted_ids is None else sorted_ids
+
+    def get_indexer(self, values):
+        # Inner ids of ``values``, -1 where unknown
+        values = np.asarray(values)
+        if len(self.sorted_ids) == 0:
+            return np.full(len(values), -1)
+        slots = np.minimum(np.searchsorted(self.sorted_ids, values), len(self.sorted_ids) - 1)
+        return np.where(self.sorted_ids[slots] == values, self.order[slots], -1)
+
+
+def fold_in_factors(qi, bi, ratings, global_mean, precision, prior=None, biased=True):
+    """(pu, bu) minimising the squared error of ``ratings`` on items ``qi`` / ``bi`` held fixed
+    plus ``sum(precision * (w - prior)^2)`` over w = (pu, bu).
+
+    The estimate is ``global_mean + bu + bi + qi @ pu`` (``qi @ pu`` when not biased).
+    ``precision`` holds one weight per factor, the bias' last; ``prior`` (pu, bu) defaults to
+    zero. One ``(k + 1) x (k + 1)`` solve.
+    """
+    k = qi.shape[1]
+    center = np.zeros(k + 1) if prior is None else np.append(prior[0], prior[1])
+    if biased:
+        x = np.hstack([qi, np.ones((len(qi), 1))])
+        y = ratings - global_mean - bi
+    else:
+        x, y = qi, ratings
+        center, precision = center[:k], precision[:k]
+    a = x.T @ x + np.diag(precision)
+    w = np.linalg.solve(a, x.T @ y + precision * center)
+    return (w[:-1], float(w[-1])) if biased else (w, 0.0)
+
+
+def _mappable(array):
+    # Memory maps cannot hold Python objects: raw ids go to a fixed-width NumPy dtype
+    array = np.asarray(array)
+    if array.dtype == object:
+        array = np.asarray(array.tolist())
+        if array.dtype == object:
+            raise ValueError("Raw ids must all be numbers or all be strings to be memory-mapped")
+    return array
+
+
+def _raw_ids_in_inner_order(raw2inner):
+    raw_ids = [None] * len(raw2inner)
+    for raw_id, inner_id in raw2inner.items():
+        raw_ids[inner_id] = raw_id
+    return raw_ids
+
+
+def max_predict_deviation(model, scorer, user_id, product_ids):
+    """Largest gap between ``scorer`` and the old per-item ``model.predict`` path."""
+    expected = np.array([model.predict(user_id, pid).est for pid in product_ids])
+    actual = scorer.score_items(user_id, product_ids)
+    return float(np.max(np.abs(expected - actual))) if len(expected) else 0.0
+
+
+# === 🏆 Top-K selection ===
+def top_k_indices(scores, k, mask=None):
+    """Positions of the ``k`` highest ``scores``, best first, ignoring positions where ``mask`` is False.
+
+    Uses ``np.argpartition`` so only the ``k`` winners get sorted; ties keep
+    their original order.
+    """
+    candidates = np.flatnonzero(mask) if mask is not None else np.arange(len(scores))
+    if k <= 0 or len(candidates) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    candidate_scores = np.asarray(scores)[candidates]
+    if k < len(candidates):
+        # Everything above the k-th best score, then the earliest ties to fill up to k
+        kth = candidate_scores[np.argpartition(-candidate_scores, k - 1)[k - 1]]
+        better = np.flatnonzero(candidate_scores > kth)
+        ties = np.flatnonzero(candidate_scores == kth)[:k - len(better)]
+        winners = np.concatenate([better, ties])
+    else:
+        winners = np.arange(len(candidates))
+    winners = winners[np.lexsort((winners, -candidate_scores[winners]))]
+    return candidates[winners]
+
+
+def spherical_kmeans(points, n_clusters, n_iter, rng):
+    """Unit-norm centroids of ``points`` (rows assumed unit-norm), Lloyd iterations on dot products."""
+    centroids = points[rng.choice(len(points), size=n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignment = np.argmax(points @ centroids.T, axis=1)
+        members = scipy.sparse.csr_matrix(
+            (np.ones(len(points)), (assignment, np.arange(len(points)))),
+            shape=(n_clusters, len(points)),
+        )
+        sums = np.asarray(members @ points)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # Empty clusters keep their previous centroid
+        centroids = np.where(norms > 0, sums / np.where(norms == 0, 1.0, norms), centroids)
+    return centroids
+
+
+# === 🗃️ Category-partitioned item blocks ===
+class CategoryItemBlocks:
+    """Catalog items grouped by ``sub_category``, each group's factors stored as one
+    contiguous block, so a category-filtered request only scores its own block.
+
+    ``positions`` map every block row back to its row in the catalog the blocks were
+    built from. Items unknown to the model are either dropped or, with
+    ``include_unknown``, kept with zero factors so they score like ``model.predict``.
+    """
+
+    def __init__(self, scorer, product_ids, categories, mask=None, include_unknown=False):
+        self.scorer = scorer
+        product_ids = np.asarray(product_ids)
+        inner_ids = scorer.item_index(product_ids)
+        keep = np.ones(len(product_ids), dtype=bool) if mask is None else np.asarray(mask, dtype=bool).copy()
+        if not include_unknown:
+            keep &= inner_ids >= 0
+
+        # Group rows by category, catalog order kept inside each group
+        categories = pd.Series(np.asarray(categories, dtype=object)).where(lambda c: c.notna(), None)
+        positions = np.flatnonzero(keep)
+        codes, uniques = pd.factorize(categories.values[positions], use_na_sentinel=False)
+        order = np.argsort(codes, kind='stable')
+        self.positions = positions[order]
+        self.product_ids = product_ids[self.positions]
+
+        inner = inner_ids[self.positions]
+        self.known = inner >= 0
+        self.qi = np.zeros((len(inner), scorer.qi.shape[1]))
+        self.bi = np.zeros(len(inner))
+        self.qi[self.known] = scorer.qi[inner[self.known]]
+        self.bi[self.known] = scorer.bi[inner[self.known]]
+
+        # Inner id -> catalog position, -1 for items outside the blocks
+        self.inner_positions = np.full(scorer.n_items, -1)
+        self.inner_positions[inner[self.known]] = self.positions[self.known]
+
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        self.blocks = {
+            category: slice(bounds[code], bounds[code + 1])
+            for code, category in enumerate(uniques)
+        }
+
+    _ARRAYS = ("positions", "product_ids", "known", "qi", "bi", "inner_positions")
+
+    def save(self, directory, **metadata):
+        """Write the block arrays as .npy files ``load`` can memory-map, plus ``metadata``."""
+        os.makedirs(directory, exist_ok=True)
+        for name in self._ARRAYS:
+            np.save(os.path.join(directory, f"blocks_{name}.npy"), _mappable(getattr(self, name)))
+        with open(os.path.join(directory, "blocks.json"), "w") as f:
+            json.dump({"blocks": [[category, int(block.start), int(block.stop)] for category, block in self.blocks.items()],
+                       **metadata}, f)
+
+    @classmethod
+    def load(cls, directory, scorer):
+        """(blocks, metadata) over read-only memory maps of the files written by ``save``; nothing is copied."""
+        with open(os.path.join(directory, "blocks.json")) as f:
+            metadata = json.load(f)
+        item_blocks = cls.__new__(cls)
+        item_blocks.scorer = scorer
+        for name in cls._ARRAYS:
+            setattr(item_blocks, name, np.load(os.path.join(directory, f"blocks_{name}.npy"), mmap_mode='r'))
+        item_blocks.blocks = {category: slice(start, stop) for category, start, stop in metadata.pop("blocks")}
+        return item_blocks, metadata
+
+    def score_block(self, user_id, block):
+        est = self.scorer.score_factors(user_id, self.qi[block], self.bi[block])
+        if not self.scorer.biased:
+            est = np.where(self.known[block], est, self.scorer._clip(self.scorer.global_mean))
+        return est
+
+    def top_k(self, user_id, k, category="All", exclude_ids=None, mips_index=None):
+        """Catalog positions and scores of the best ``k`` items, best first.
+
+        A single category scores only its block; "All" takes the top ``k`` of every
+        block and merges them, or asks ``mips_index`` when one is given and every
+        item is known to the model.
+        """
+        if category == "All" and mips_index is not None and self.known.all():
+            allowed = self.inner_positions >= 0
+            if exclude_ids is not None and len(exclude_ids):
+                excluded = self.scorer.item_index(exclude_ids)
+                allowed[excluded[excluded >= 0]] = False
+            inner_ids, scores = mips_index.search(user_id, k, allowed)
+            return self.inner_positions[inner_ids], scores
+
+        if category == "All":
+            blocks = list(self.blocks.values())
+        elif category in self.blocks:
+            blocks = [self.blocks[category]]
+        else:
+            blocks = []
+
+        positions, scores = [], []
+        for block in blocks:
+            block_scores = self.score_block(user_id, block)
+            mask = None
+            if exclude_ids is not None and len(exclude_ids):
+                mask = ~np.isin(self.product_ids[block], exclude_ids)
+            top = top_k_indices(block_scores, k, mask)
+            positions.append(self.positions[block][top])
+            scores.append(block_scores[top])
+
+        if not positions:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        positions, scores = np.concatenate(positions), np.concatenate(scores)
+
+        # Merge: equal scores keep catalog order
+        by_position = np.argsort(positions, kind='stable')
+        positions, scores = positions[by_position], scores[by_position]
+        top = top_k_indices(scores, k)
+        return positions[top], scores[top]
+
+    def top_k_many(self, user_ids, k, exclude_ids=None):
+        """``top_k(user_id, k, "All", exclude_ids[i])`` for every ``user_ids[i]``, scored as one matrix product.
+
+        Returns one ``(positions, scores)`` pair per user. The per-block merge of ``top_k``
+        ranks ties by catalog position, so scanning the items in catalog order gives the
+        same winners; scores can differ from the one-user path in the last bits (BLAS).
+        """
+        if not hasattr(self, "_catalog_order"):
+            self._catalog_order = np.argsort(self.positions, kind='stable')
+        order = self._catalog_order
+        positions, product_ids, known = self.positions[order], self.product_ids[order], self.known[order]
+
+        est = self.scorer.score_factors_many(user_ids, self.qi[order], self.bi[order])
+        if not self.scorer.biased:
+            est[:, ~known] = self.scorer._clip(self.scorer.global_mean)
+
+        results = []
+        for row, user_scores in enumerate(est):
+            mask = None
+            if exclude_ids is not None and len(exclude_ids[row]):
+                mask = ~np.isin(product_ids, exclude_ids[row])
+            top = top_k_indices(user_scores, k, mask)
+            results.append((positions[top], user_scores[top]))
+        return results
+
+
+# === 🧭 Maximum-inner-product search over item factors ===
+class MIPSIndex:
+    """Approximate top-K items for a user without scoring the whole catalog.
+
+    For a fixed user the ranking only depends on ``qi @ pu + bi`` = ``[qi, bi] @ [pu, 1]``.
+    Items ``[qi, bi]`` get one extra coordinate ``sqrt(M^2 - |x|^2)`` so they all share
+    the norm ``M``; maximum inner product then equals maximum cosine, and items are
+    partitioned with spherical k-means. A query scores only the items of its
+    ``n_probe`` closest partitions (exactly), and probes the next closest ones too
+    when those cannot fill ``k`` results.
+    """
+
+    def __init__(self, scorer, n_lists=None, n_probe=8, n_iter=10, sample_size=100_000, seed=0):
+        self.scorer = scorer
+        self.n_probe = n_probe
+        rng = np.random.default_rng(seed)
+
+        bias = scorer.bi if scorer.biased else np.zeros(scorer.n_items)
+        items = np.hstack([scorer.qi, bias[:, None]])
+        norms = np.linalg.norm(items, axis=1)
+        max_norm = norms.max() if len(norms) and norms.max() > 0 else 1.0
+        augmented = np.hstack([items, np.sqrt(np.maximum(max_norm**2 - norms**2, 0))[:, None]]) / max_norm
+
+        n_lists = min(n_lists or max(1, int(np.sqrt(scorer.n_items))), scorer.n_items)
+        sample = augmented[rng.choice(scorer.n_items, size=min(sample_size, scorer.n_items), replace=False)]
+        self.centroids = spherical_kmeans(sample, n_lists, n_iter, rng)
+        assignment = np.argmax(augmented @ self.centroids.T, axis=1)
+
+        # Items of partition l are inner ids order[offsets[l]:offsets[l + 1]], factors stored contiguously
+        self.order = np.argsort(assignment, kind='stable')
+        self.offsets = np.searchsorted(assignment[self.order], np.arange(n_lists + 1))
+        self.items = items[self.order]
+
+    def _query(self, user_id):
+        factors = self.scorer.user_factors(user_id)
+        pu = factors[0] if factors is not None else np.zeros(self.scorer.qi.shape[1])
+        return factors, np.append(pu, 1.0 if self.scorer.biased else 0.0)
+
+    def _estimate(self, factors, raw):
+        if not self.scorer.biased:
+            est = raw if factors is not None else np.full(len(raw), self.scorer.global_mean)
+        else:
+            est = raw + self.scorer.global_mean + (factors[1] if factors is not None else 0.0)
+        return self.scorer._clip(est)
+
+    def search(self, user_id, k, allowed=None, n_probe=None):
+        """Inner ids and estimated ratings of the (approximate) best ``k`` items, best first.
+
+        ``allowed`` is an optional boolean mask over inner ids (e.g. not rated yet).
+        """
+        factors, query = self._query(user_id)
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        if n_probe >= len(self.centroids):
+            return self.search_exact(user_id, k, allowed)
+
+        rows, _ = self._probe(query, k, allowed, n_probe)
+        candidates = self.order[rows]
+        mask = allowed[candidates] if allowed is not None else None
+        raw = self.items[rows] @ query
+        top = top_k_indices(raw, k, mask)
+        return candidates[top], self._estimate(factors, raw[top])
+
+    def _probe(self, query, k, allowed, n_probe):
+        # (sorted rows, partition count) of the n_probe partitions closest to the query, then of
+        # the next closest ones until they hold k allowed items. Routes with the augmented
+        # query [q, 0]; its norm does not change the ranking
+        ranked = np.argsort(-(self.centroids[:, :-1] @ query), kind='stable')
+        parts, n_allowed = [], 0
+        for p in ranked:
+            rows = np.arange(self.offsets[p], self.offsets[p + 1])
+            parts.append(rows)
+            n_allowed += len(rows) if allowed is None else int(allowed[self.order[rows]].sum())
+            if len(parts) >= n_probe and n_allowed >= k:
+                break
+        return np.sort(np.concatenate(parts)), len(parts)
+
+    def search_exact(self, user_id, k, allowed=None):
+        factors, query = self._query(user_id)
+        raw = np.empty(self.scorer.n_items)
+        raw[self.order] = self.items @ query
+        top = top_k_indices(raw, k, allowed)
+        return top, self._estimate(factors, raw[top])
+
+
+def mips_recall_report(index, user_ids, k=10, probes=(1, 2, 4, 8, 16, 32)):
+    """Recall@k against the exact scan and mean latency per user for each ``n_probe``, with the
+    share of queries whose partitions held fewer than ``k`` items, so that more were probed.
+    """
+    start = time.perf_counter()
+    exact = [index.search_exact(user_id, k)[0] for user_id in user_ids]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(user_ids)
+
+    report = []
+    for n_probe in probes:
+        start = time.perf_counter()
+        approx = [index.search(user_id, k, n_probe=n_probe)[0] for user_id in user_ids]
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(user_ids)
+        hits = [len(np.intersect1d(a, e)) for a, e in zip(approx, exact)]
+        probed = [index._probe(index._query(user_id)[1], k, None, n_probe)[1] for user_id in user_ids]
+        report.append({
+            "n_probe": n_probe,
+            "recall": float(np.mean(hits)) / k,
+            "ms_per_user": elapsed_ms,
+            "exact_ms_per_user": exact_ms,
+            "widened": float(np.mean(np.array(probed) > n_probe)),
+            "mean_probed": float(np.mean(probed)),
+        })
+    return report
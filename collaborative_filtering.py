@@ -1,10 +1,13 @@
 import streamlit as st
 import pandas as pd
-import pickle
 import numpy as np
-import scipy.sparse
 import base64
 import math
+import time
+from data_store import get_history_index, get_leaderboard, get_product_index, get_products, get_ratings
+from recommender import collab_filtering, collab_request
+from result_cache import session_recommendations
+from stage_metrics import record, span
 # Get user's language choice
 language = st.session_state.get("language", "English")
 
@@ -28,62 +31,16 @@ st.markdown("""
 dataset_name_user_rating = "Products_ThoiTrangNam_rating.csv"
 dataset_name_products = "Products_ThoiTrangNam_downsize.csv"
 
-@st.cache_data
-def load_data():
-    user_rating = pd.read_csv(dataset_name_user_rating)
-    products = pd.read_csv(dataset_name_products)
-    products =products.drop(columns=['Unnamed: 0'])
-
-    return user_rating, products
-
-user_rating_df, products_df = load_data()
+# Shared per-process tables from data_store (Parquet copies when ingested, otherwise the CSVs)
+with span("page.load_data"):
+    user_rating_df = get_ratings()
+    products_df = get_products()
+    product_index = get_product_index()
+    leaderboard = get_leaderboard()  # top users by activity, for the user pickers
+    history_index = get_history_index()
 
 # === Model set up ===
-with open('surprise.pkl', 'rb') as f:
-    model = pickle.load(f)
-
-# Load the model
-def collab_filtering(user_id, top_n=5, categories='All'):
-    # Get user history of positively rated items
-    user_history = user_rating_df[
-        (user_rating_df['user_id'] == user_id) & 
-        (user_rating_df['rating'] >= 3)
-    ]
-
-    # Get all unique product IDs
-    all_product_ids = products_df['product_id'].unique()
-
-    # Keep only products known to the model
-    known_items = set(model.trainset._raw2inner_id_items.keys())
-    known_product_ids = [pid for pid in all_product_ids if pid in known_items]
-
-    # Predict scores for known items
-    predictions = [
-        (pid, model.predict(user_id, pid).est) 
-        for pid in known_product_ids 
-        if pid not in user_history['product_id'].values
-    ]
-
-    # Build DataFrame of predictions
-    pred_df = pd.DataFrame(predictions, columns=['product_id', 'EstimateScore'])
-
-    # Merge with product info
-    recommendations = pred_df.merge(
-        products_df.drop(columns='rating', errors='ignore').drop_duplicates(subset='product_id'),
-        on='product_id',
-        how='left'
-    ).dropna(subset=['product_name'])
-
-    # Filter by category
-    if categories != "All":
-        recommendations = recommendations[recommendations["sub_category"] == categories]
-
-    # Round and sort
-    recommendations["EstimateScore"] = recommendations["EstimateScore"].round(2)
-    recommendations = recommendations.sort_values(by='EstimateScore', ascending=False)
-
-    return recommendations.head(top_n if len(recommendations) >= top_n else len(recommendations))
-
+# collab_filtering comes from recommender: scoring blocks and models are loaded once per process
 
 custom_info = f"""
     <div style="background-color: #e8f4fd; padding: 10px 12px; border-radius: 16px; margin-bottom: 20px">
@@ -128,15 +85,7 @@ else:
         
 st.markdown("---")
 product_names = products_df['product_name'].dropna().unique()
-top_users = (
-    user_rating_df['user']
-    .dropna()
-    .loc[~user_rating_df['user'].str.contains(r'\*', regex=True)]
-    .value_counts()
-    .head(100)
-    .index
-)
-users_name = top_users.tolist()
+users_name = leaderboard.top_names(100)
 
 custom_info = f"""
     <div style="background-color: #e8f4fd; padding: 10px 12px; border-radius: 16px; margin-bottom: 20px; margin-top: 20px">
@@ -172,24 +121,11 @@ with col1:
         )
 # 👇 Load the top 100 users based on selection mode
 if "Name" in selection_mode or "Tên" in selection_mode:
-    top_users = (
-            user_rating_df['user']
-            .dropna()
-            .loc[~user_rating_df['user'].str.contains(r'\*', regex=True)]
-            .value_counts()
-            .head(100)
-            .index
-        )
+    top_users = leaderboard.top_names(100)
 else:
-    top_users = (
-            user_rating_df['user_id']
-            .dropna()
-            .value_counts()
-            .head(100)
-            .index
-    )
+    top_users = leaderboard.top_user_ids(100)
 
-users_name = top_users.tolist()
+users_name = top_users
 with col2:
         selected_user = st.selectbox(
         label="User List" if language == "English" else "Danh sách người dùng",
@@ -200,42 +136,29 @@ with col2:
     
 if "Name" in selection_mode or "Tên" in selection_mode:
     # Map the selected name to the corresponding user_id(s) — take the most active one if duplicates
-        user_id = (
-            user_rating_df[user_rating_df['user'] == selected_user]
-            .groupby('user_id')
-            .size()
-            .sort_values(ascending=False)
-            .index[0]
-        )
+        user_id = leaderboard.most_active_user_id(selected_user)
 else:
     user_id = selected_user  # already a user_id
-product_ids = (
-    user_rating_df[user_rating_df["user_id"] == user_id]
-    .drop_duplicates(keep="first")
-    .sort_values("rating")  # Now sorting works because 'rating' is present
-    .head(100)["product_id"]
-    .tolist()
-    )
+# Up to 100 products the user rated, lowest rating first
+render_start = time.perf_counter()
+product_ids = history_index.lowest_rated(user_id, 100)
 
-for x in product_ids:
-        product_row = products_df[products_df["product_id"] == x]
+for product_row in product_index.lookup_many(product_ids).to_dict("records"):
+        # Extract image
+        image_url = product_row["image"]
         
-        if not product_row.empty:
-            # Extract image
-            image_url = product_row["image"].values[0]
-            
-            # Check for missing/NaN image
-            if not image_url or (isinstance(image_url, float) and math.isnan(image_url)):
-                image_url = f"data:image/jpg;base64,{image_base64}"
-
-            products.append({
-                "name": product_row["product_name"].values[0],
-                "price": product_row["price"].values[0],
-                "rating": product_row["rating"].values[0],
-                "image": image_url,
-                "category": product_row["sub_category"].values[0],
-                "product_url": product_row["link"].values[0],
-            })
+        # Check for missing/NaN image
+        if not image_url or (isinstance(image_url, float) and math.isnan(image_url)):
+            image_url = f"data:image/jpg;base64,{image_base64}"
+
+        products.append({
+            "name": product_row["product_name"],
+            "price": product_row["price"],
+            "rating": round(float(product_row["rating"]), 2),
+            "image": image_url,
+            "category": product_row["sub_category"],
+            "product_url": product_row["link"],
+        })
 
     # CSS for horizontal scrolling
 if language == "English":
@@ -309,6 +232,7 @@ product_html += '</div>'
 
 
 st.markdown(product_html, unsafe_allow_html=True)
+record("collab.render_history", time.perf_counter() - render_start)
 st.markdown("---")
 
 st.markdown(recommend_info, unsafe_allow_html=True)
@@ -334,10 +258,15 @@ with col2:
         
 button_clicked = st.button("🔍 Generate Recommendations" if language == "English" else "🔍 Nhận các sản phẩm gợi ý", use_container_width=True)
 
-# === Step 1: Trigger recommendation only on button click ===
-if button_clicked:
-    recommendations = collab_filtering(user_id, num_products2, selected_category)
+# === Step 1: Compute on button click, then keep the result for this session ===
+request = collab_request(user_id, num_products2, selected_category)
+with span("collab.recommend"):  # session/shared cache lookup, collab_filtering on a miss
+    recommendations = session_recommendations(
+        request, button_clicked, lambda: collab_filtering(user_id, num_products2, selected_category))
+
+if recommendations is not None:
 
+    render_start = time.perf_counter()
     suggested_products = []
     for _, row in recommendations.iterrows():
             suggested_products.append({
@@ -346,12 +275,11 @@ if button_clicked:
                 "product_url": row.get("link", "https://example.com/product"),  # default if missing
                 "product_category": row["sub_category"],
                 "price": int(row.get("price", 0)),
-                "rating": float(row.get("EstimateScore", 0)),
+                "rating": round(float(row.get("EstimateScore", 0)), 2),
                 # "description": row.get("description_clean", "No description available.")
             })
             
-    product_name = user_rating_df.loc[user_rating_df["user_id"] == user_id, "user"].values
-    content = product_name[0]
+    content = history_index.user_name(user_id)
 
     what = "for User" if language == "English" else "dành cho"
     st.markdown(
@@ -446,4 +374,5 @@ if button_clicked:
 
     scrollable_html += '</div>'
 
-    st.markdown(scrollable_html, unsafe_allow_html=True)
\ No newline at end of file
+    st.markdown(scrollable_html, unsafe_allow_html=True)
+    record("collab.render", time.perf_counter() - render_start)
\ No newline at end of file
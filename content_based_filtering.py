@@ -1,10 +1,14 @@
 import streamlit as st
 import pandas as pd
-import pickle
 import numpy as np
-import scipy.sparse
 import base64
 import math
+import time
+from data_store import get_product_index, get_products
+from model_registry import content_version
+from recommender import content_based_filtering
+from result_cache import session_recommendations
+from stage_metrics import record, span
 # Get user's language choice
 language = st.session_state.get("language", "English")
 
@@ -28,40 +32,13 @@ st.markdown("""
 dataset_name_user_rating = "Products_ThoiTrangNam_rating.csv"
 dataset_name_products = "Products_ThoiTrangNam_downsize.csv"
 
-@st.cache_data
-def load_data():
-    user_rating = pd.read_csv(dataset_name_user_rating)
-    products = pd.read_csv(dataset_name_products)
-    products =products.drop(columns=['Unnamed: 0'])
+# Shared per-process tables from data_store (Parquet copies when ingested, otherwise the CSVs)
+with span("page.load_data"):
+    products_df = get_products()
+    product_index = get_product_index()
 
-    return user_rating, products
-
-user_rating_df, products_df = load_data()
-
-tfidf_matrix = scipy.sparse.load_npz('tfidf_matrix.npz')
-
-with open('gensim.pkl', 'rb') as f:
-    model2 = pickle.load(f)
-
-def content_based_filtering(product_id, top_n=5):
-    try:
-        idx = products_df.index[products_df['product_id'] == product_id][0]
-    except IndexError:
-        return f"❌ Product ID '{product_id}' not found in dataset."
-
-    # Get top N similar product indices and distances
-    distances, indices = model2.kneighbors(tfidf_matrix[idx], n_neighbors=top_n + 1)  # +1 to skip self
-    # Drop the first index (which is the product itself)
-    similar_indices = indices.flatten()[1:]
-    # Fetch recommended product info
-    valid_indices = [i for i in similar_indices if i < len(products_df)]
-
-    # Safely fetch recommended product info
-    recommendation = products_df.iloc[valid_indices].copy()
-    recommendation =recommendation.rename(columns={"rating": "EstimateScore"})
-    
-    recommendation = recommendation.sort_values(by='EstimateScore', ascending=False)
-    return recommendation
+# === Model set up ===
+# content_based_filtering comes from recommender: the TF-IDF matrix and indexes are loaded once per process
 
 custom_info = f"""
     <div style="background-color: #e8f4fd; padding: 10px 12px; border-radius: 16px; margin-bottom: 20px">
@@ -105,15 +82,6 @@ else:
         
 st.markdown("---")
 product_names = products_df['product_name'].dropna().unique()
-top_users = (
-    user_rating_df['user']
-    .dropna()
-    .loc[~user_rating_df['user'].str.contains(r'\*', regex=True)]
-    .value_counts()
-    .head(100)
-    .index
-)
-users_name = top_users.tolist()
 st.markdown(
     f"""
     <div style='font-size: 1.25rem; font-weight: 600; margin-bottom: 0rem;'>
@@ -191,9 +159,15 @@ else:
 st.markdown("---")
 
 button_clicked = st.button("🔍 Generate Recommendations" if language == "English" else "🔍 Nhận các sản phẩm gợi ý", use_container_width=True)
-if button_clicked:
-    recommendations = content_based_filtering(product_id, num_products1)
+# Computed on button click, then kept for this session
+request = ("content", product_id, num_products1, None, content_version())
+with span("content.recommend"):  # session/shared cache lookup, content_based_filtering on a miss
+    recommendations = session_recommendations(
+        request, button_clicked, lambda: content_based_filtering(product_id, num_products1))
+
+if recommendations is not None:
 
+    render_start = time.perf_counter()
     suggested_products = []
     for _, row in recommendations.iterrows():
             suggested_products.append({
@@ -202,11 +176,10 @@ if button_clicked:
                 "product_url": row.get("link", "https://example.com/product"),  # default if missing
                 "product_category": row["sub_category"],
                 "price": int(row.get("price", 0)),
-                "rating": float(row.get("EstimateScore", 0)),
+                "rating": round(float(row.get("EstimateScore", 0)), 2),
                 # "description": row.get("description_clean", "No description available.")
             })
-    product_name = products_df.loc[products_df["product_id"] == product_id, "product_name"].values
-    content = product_name[0]
+    content = product_index.lookup(product_id)["product_name"]
     print(content)
     what = "based on" if language == "English" else "dựa trên"
     st.markdown(
@@ -301,4 +274,5 @@ if button_clicked:
 
     scrollable_html += '</div>'
 
-    st.markdown(scrollable_html, unsafe_allow_html=True)
\ No newline at end of file
+    st.markdown(scrollable_html, unsafe_allow_html=True)
+    record("content.render", time.perf_counter() - render_start)
\ No newline at end of file
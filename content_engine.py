@@ -0,0 +1,306 @@
+import os
+
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+
+from cf_engine import spherical_kmeans, top_k_indices
+
+
+# === 📐 Exact cosine kNN ===
+class ExactCosineIndex:
+    """Brute-force cosine kNN over the TF-IDF rows (what the pickled NearestNeighbors does).
+
+    Exposes the same ``kneighbors(X, n_neighbors)`` call as sklearn so the pages
+    can swap indexes without touching their code.
+    """
+
+    def __init__(self, matrix):
+        self.matrix = scipy.sparse.csr_matrix(matrix)
+        self.row_norms = _row_norms(self.matrix)
+
+    def kneighbors(self, X, n_neighbors=5):
+        X = scipy.sparse.csr_matrix(X)
+        distances, indices = [], []
+        for q in range(X.shape[0]):
+            query = X[q]
+            similarity = _cosine(self.matrix, self.row_norms, query)
+            top = top_k_indices(similarity, n_neighbors)
+            indices.append(top)
+            distances.append(1.0 - similarity[top])
+        return np.vstack(distances), np.vstack(indices)
+
+
+# === 🧭 Approximate kNN: IVF over a truncated SVD projection ===
+class IVFCosineIndex:
+    """Inverted-file index: rows are bucketed by their nearest k-means centroid in a
+    low-rank SVD space, and a query only re-ranks the rows of its ``n_probe`` closest
+    buckets with exact cosine on the TF-IDF vectors.
+
+    ``n_probe`` is the recall/latency knob: more buckets probed means higher recall
+    and more rows scored per query.
+    """
+
+    def __init__(self, matrix, n_components=64, n_lists=None, n_probe=8,
+                 n_iter=10, sample_size=100_000, seed=0):
+        self.matrix = scipy.sparse.csr_matrix(matrix, dtype=np.float64)
+        self.row_norms = _row_norms(self.matrix)
+        self.n_probe = n_probe
+        n_rows = self.matrix.shape[0]
+        rng = np.random.default_rng(seed)
+
+        # Low-rank projection used only to route rows and queries to buckets
+        n_components = max(1, min(n_components, min(self.matrix.shape) - 1))
+        _, _, vt = scipy.sparse.linalg.svds(self.matrix, k=n_components, random_state=seed)
+        self.components = vt.T
+        projected = self._project(self.matrix)
+
+        # Spherical k-means on a sample, then assign every row to a bucket
+        n_lists = n_lists or max(1, int(np.sqrt(n_rows)))
+        n_lists = min(n_lists, n_rows)
+        sample = projected[rng.choice(n_rows, size=min(sample_size, n_rows), replace=False)]
+        self.centroids = spherical_kmeans(sample, n_lists, n_iter, rng)
+        assignment = np.argmax(projected @ self.centroids.T, axis=1)
+
+        # Bucket members stored contiguously: rows of list l are order[offsets[l]:offsets[l + 1]]
+        self.order = np.argsort(assignment, kind='stable')
+        self.offsets = np.searchsorted(assignment[self.order], np.arange(n_lists + 1))
+
+    def _project(self, X):
+        projected = np.asarray(X @ self.components)
+        norms = np.linalg.norm(projected, axis=1, keepdims=True)
+        return projected / np.where(norms == 0, 1.0, norms)
+
+    def kneighbors(self, X, n_neighbors=5, n_probe=None):
+        X = scipy.sparse.csr_matrix(X)
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        routes = self._project(X) @ self.centroids.T
+
+        distances, indices = [], []
+        for q in range(X.shape[0]):
+            lists = top_k_indices(routes[q], n_probe)
+            candidates = np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+            similarity = _cosine(self.matrix[candidates], self.row_norms[candidates], X[q])
+            top = top_k_indices(similarity, n_neighbors)
+
+            # Pad with -1 / inf when the probed buckets hold fewer than n_neighbors rows
+            found = np.full(n_neighbors, -1, dtype=np.intp)
+            dist = np.full(n_neighbors, np.inf)
+            found[:len(top)] = candidates[top]
+            dist[:len(top)] = 1.0 - similarity[top]
+            indices.append(found)
+            distances.append(dist)
+        return np.vstack(distances), np.vstack(indices)
+
+
+ANN_BACKENDS = {
+    "exact": ExactCosineIndex,
+    "ivf": IVFCosineIndex,
+}
+
+
+def build_ann_index(matrix, backend="ivf", **params):
+    try:
+        index_cls = ANN_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown ANN backend '{backend}', choose one of {sorted(ANN_BACKENDS)}")
+    return index_cls(matrix, **params)
+
+
+def recall_at_k(index, exact_index, queries, k=10, **params):
+    """Mean fraction of the exact top-``k`` neighbours that ``index`` also returns."""
+    _, approx = index.kneighbors(queries, n_neighbors=k, **params)
+    _, exact = exact_index.kneighbors(queries, n_neighbors=k)
+    hits = [len(np.intersect1d(a, e)) for a, e in zip(approx, exact)]
+    return float(np.mean(hits)) / k
+
+
+# === 🔧 Helpers ===
+def _row_norms(matrix):
+    return np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+
+
+def _cosine(rows, row_norms, query):
+    dots = np.asarray((rows @ query.T).todense()).ravel()
+    query_norm = np.sqrt(query.multiply(query).sum())
+    denom = row_norms * query_norm
+    return np.divide(dots, denom, out=np.zeros_like(dots), where=denom > 0)
+
+
+# === 🗂️ Precomputed item-to-item neighbour table ===
+NEIGHBOUR_INDICES_FILE = "neighbour_indices.npy"
+NEIGHBOUR_DISTANCES_FILE = "neighbour_distances.npy"
+
+
+def build_neighbour_table(matrix, n_neighbors=50, memory_budget=256 * 2**20):
+    """Top ``n_neighbors`` cosine neighbours (self excluded) of every row, best first.
+
+    Rows are processed in blocks sized so the dense ``block x n_rows`` similarity
+    slab stays under ``memory_budget`` bytes.
+    """
+    matrix = _unit_rows(matrix)
+    n_rows = matrix.shape[0]
+    n_neighbors = min(n_neighbors, n_rows - 1)
+    block_size = max(1, memory_budget // (4 * n_rows))
+    matrix_t = matrix.T.tocsc()
+
+    indices = np.empty((n_rows, n_neighbors), dtype=np.int32)
+    distances = np.empty((n_rows, n_neighbors), dtype=np.float32)
+    for start in range(0, n_rows, block_size):
+        stop = min(start + block_size, n_rows)
+        similarity = (matrix[start:stop] @ matrix_t).toarray()
+        rows = np.arange(stop - start)
+        similarity[rows, rows + start] = -np.inf
+        indices[start:stop], distances[start:stop] = _top_neighbours(similarity, n_neighbors)
+    return indices, distances
+
+
+def extend_neighbour_table(indices, distances, matrix, memory_budget=256 * 2**20):
+    """The neighbour table of ``matrix`` from the table of its first ``len(indices)`` rows.
+
+    Only the appended rows are compared with every row: they get their own neighbours,
+    and they replace the farthest neighbours of the existing rows they are closer to.
+    Same result as ``build_neighbour_table`` on the whole matrix, up to the order of ties.
+    """
+    matrix = _unit_rows(matrix)
+    n_old, n_rows = len(indices), matrix.shape[0]
+    width = indices.shape[1]
+    block_size = max(1, memory_budget // (4 * n_rows))
+    matrix_t = matrix.T.tocsc()
+
+    new_indices = np.empty((n_rows - n_old, width), dtype=np.int32)
+    new_distances = np.empty((n_rows - n_old, width), dtype=np.float32)
+    indices, distances = np.asarray(indices), np.asarray(distances)
+    for start in range(n_old, n_rows, block_size):
+        stop = min(start + block_size, n_rows)
+        similarity = (matrix[start:stop] @ matrix_t).toarray()
+        rows = np.arange(stop - start)
+        similarity[rows, rows + start] = -np.inf
+        new_indices[start - n_old:stop - n_old], new_distances[start - n_old:stop - n_old] = \
+            _top_neighbours(similarity, width)
+
+        # Existing rows: their current neighbours against this block of new rows
+        candidates = np.hstack([1.0 - distances, similarity[:, :n_old].T])
+        candidate_ids = np.hstack([indices, np.broadcast_to(np.arange(start, stop, dtype=np.int32), (n_old, stop - start))])
+        top, distances = _top_neighbours(candidates, width)
+        indices = np.take_along_axis(candidate_ids, top, axis=1)
+    return np.vstack([indices, new_indices]), np.vstack([distances, new_distances])
+
+
+def _unit_rows(matrix):
+    # float32 CSR rows scaled to unit length: dot products are cosine similarities
+    matrix = scipy.sparse.csr_matrix(matrix, dtype=np.float32)
+    norms = _row_norms(matrix)
+    matrix = scipy.sparse.diags(np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)) @ matrix
+    return matrix.astype(np.float32)
+
+
+def _top_neighbours(similarity, n_neighbors):
+    # Columns of the n_neighbors largest similarities of every row, best first, and their distances
+    top = np.argpartition(-similarity, n_neighbors - 1, axis=1)[:, :n_neighbors]
+    top_similarity = np.take_along_axis(similarity, top, axis=1)
+    order = np.argsort(-top_similarity, axis=1, kind='stable')
+    return (np.take_along_axis(top, order, axis=1).astype(np.int32),
+            (1.0 - np.take_along_axis(top_similarity, order, axis=1)).astype(np.float32))
+
+
+def save_neighbour_table(indices, distances, directory="."):
+    # Renamed into place: processes mapping the previous files keep reading them intact
+    for name, array in ((NEIGHBOUR_DISTANCES_FILE, distances), (NEIGHBOUR_INDICES_FILE, indices)):
+        path = os.path.join(directory, name)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, array)
+        os.replace(tmp_path, path)
+
+
+class NeighbourTable:
+    """Read-only view of the precomputed neighbour arrays.
+
+    Arrays are opened with ``mmap_mode='r'`` so a lookup is a row slice and every
+    server process shares the same page-cache copy.
+    """
+
+    def __init__(self, directory="."):
+        self.indices = np.load(os.path.join(directory, NEIGHBOUR_INDICES_FILE), mmap_mode='r')
+        self.distances = np.load(os.path.join(directory, NEIGHBOUR_DISTANCES_FILE), mmap_mode='r')
+
+    @property
+    def width(self):
+        return self.indices.shape[1]
+
+    def __len__(self):
+        return self.indices.shape[0]
+
+    def neighbours(self, row, n_neighbors):
+        return np.asarray(self.distances[row, :n_neighbors]), np.asarray(self.indices[row, :n_neighbors])
+
+
+def load_neighbour_table(directory=".", n_rows=None):
+    # None when the table has not been built, or was built for another TF-IDF matrix
+    if not os.path.exists(os.path.join(directory, NEIGHBOUR_INDICES_FILE)):
+        return None
+    table = NeighbourTable(directory)
+    if n_rows is not None and len(table) != n_rows:
+        return None
+    if len(table.distances) != len(table):  # caught between the two files of an update
+        return None
+    return table
+
+
+# === #️⃣ Incremental TF-IDF: feature hashing + running document frequencies ===
+CONTENT_TEXT_COLUMN = "description_clean"
+HASHING_STATE_FILE = "tfidf_hashing.npz"
+
+
+class HashingTfidf:
+    """TF-IDF rows without a fitted vocabulary, so new products can be vectorized any time.
+
+    Terms are hashed into ``n_features`` columns and document frequencies are running
+    counts over every document seen. Weighting follows sklearn's TfidfVectorizer defaults
+    (smooth idf, L2-normalised rows). Rows added by ``append`` use the idf of their time;
+    ``fit_transform`` over every document (a full rebuild) puts all rows on one idf again.
+    """
+
+    def __init__(self, n_features=2**20, df=None, n_docs=0, n_docs_at_rebuild=0):
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.hasher = HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None)
+        self.n_features = n_features
+        self.df = np.zeros(n_features, dtype=np.int64) if df is None else np.asarray(df, dtype=np.int64)
+        self.n_docs = n_docs
+        self.n_docs_at_rebuild = n_docs_at_rebuild  # documents covered by the last full rebuild
+
+    def _count(self, texts):
+        counts = self.hasher.transform(texts).tocsr()
+        counts.sum_duplicates()
+        self.df += np.bincount(counts.indices, minlength=self.n_features)
+        self.n_docs += counts.shape[0]
+        return counts
+
+    def _weigh(self, counts):
+        from sklearn.preprocessing import normalize
+
+        idf = np.log((1 + self.n_docs) / (1 + self.df)) + 1
+        return normalize(counts @ scipy.sparse.diags(idf), norm='l2', copy=False).tocsr()
+
+    def fit_transform(self, texts):
+        """Rows of ``texts`` with document frequencies counted from them alone."""
+        self.df[:] = 0
+        self.n_docs = 0
+        weighted = self._weigh(self._count(texts))
+        self.n_docs_at_rebuild = self.n_docs
+        return weighted
+
+    def append(self, texts):
+        """Rows of new documents ``texts``, after adding them to the document frequencies."""
+        return self._weigh(self._count(texts))
+
+    def save(self, path=HASHING_STATE_FILE):
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, df=self.df, n_docs=self.n_docs, n_docs_at_rebuild=self.n_docs_at_rebuild)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=HASHING_STATE_FILE):
+        with np.load(path) as state:
+            return cls(len(state["df"]), state["df"], int(state["n_docs"]), int(state["n_docs_at_rebuild"]))
@@ -0,0 +1,488 @@
+import io
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# === 📊 Dataset files ===
+RATINGS_CSV = "Products_ThoiTrangNam_rating.csv"
+PRODUCTS_CSV = "Products_ThoiTrangNam_downsize.csv"
+
+# Typed columnar copies written once by `python ingest.py`
+RATINGS_PARQUET = "Products_ThoiTrangNam_rating.parquet"
+PRODUCTS_PARQUET = "Products_ThoiTrangNam_downsize.parquet"
+
+CATEGORICAL_COLUMNS = ("sub_category",)
+# Ratings: names and product ids dictionary-encoded into dense integer codes; the side
+# lookup table of each is its ``.cat.categories`` (see ``decode``)
+RATINGS_CATEGORICAL_COLUMNS = ("user", "product_id")
+INT8_COLUMNS = ("rating",)
+
+# Per-user rating counts behind the "top 100 users" pickers
+USER_ACTIVITY_PARQUET = "user_activity.parquet"
+
+# Ratings given since the collaborative model was trained, folded into it without
+# retraining. Append-only, no header, the ratings file's columns in this order
+RATING_LOG_CSV = "ratings_log.csv"
+RATING_LOG_COLUMNS = ("user_id", "product_id", "rating", "user")
+
+
+def read_ratings_csv(path=RATINGS_CSV):
+    return pd.read_csv(path)
+
+
+def read_products_csv(path=PRODUCTS_CSV):
+    products = pd.read_csv(path)
+    return products.drop(columns=['Unnamed: 0'], errors='ignore')
+
+
+def compact_dtypes(df, categorical=CATEGORICAL_COLUMNS):
+    """int32 ids/counts (int8 star ratings), ``categorical`` columns as codes.
+
+    Floats (average ratings, prices) stay float64: they are shown and served as read, and
+    float32 would turn 4.6 into 4.599999904632568.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(df[col]):
+            for dtype in ((np.int8, np.int32) if col in INT8_COLUMNS else (np.int32,)):
+                info = np.iinfo(dtype)
+                if df[col].min() >= info.min and df[col].max() <= info.max:
+                    df[col] = df[col].astype(dtype)
+                    break
+        if col in categorical:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def decode(column, positions=None):
+    """Values of ``column`` (at ``positions``) with dictionary-encoded columns looked up again.
+
+    Only the selected codes are translated, through the categories array, so decoding a
+    few rows of a large table never materialises the whole column.
+    """
+    if not isinstance(column.dtype, pd.CategoricalDtype):
+        values = column.values
+        return values if positions is None else values[positions]
+    codes = column.cat.codes.to_numpy()
+    if positions is not None:
+        codes = codes[positions]
+    categories = column.cat.categories.to_numpy()
+    if (codes < 0).any():
+        categories = np.append(categories.astype(object), np.nan)  # code -1 (missing) picks the NaN
+    return categories[codes]
+
+
+def column_memory(df):
+    """{column: (dtype, bytes)} including string contents."""
+    usage = df.memory_usage(deep=True, index=False)
+    return {col: (str(df[col].dtype), int(usage[col])) for col in df.columns}
+
+
+def ingest(ratings_csv=RATINGS_CSV, products_csv=PRODUCTS_CSV,
+           ratings_parquet=RATINGS_PARQUET, products_parquet=PRODUCTS_PARQUET,
+           user_activity=USER_ACTIVITY_PARQUET):
+    """Write the typed Parquet copies and the leaderboard.
+
+    Returns ``{table: (column_memory before, column_memory after)}``, the in-memory
+    footprint of each table as read from the CSV and as the pages now hold it.
+    """
+    raw_ratings, raw_products = read_ratings_csv(ratings_csv), read_products_csv(products_csv)
+    ratings = compact_dtypes(raw_ratings, RATINGS_CATEGORICAL_COLUMNS)
+    products = compact_dtypes(raw_products)
+    ratings.to_parquet(ratings_parquet, index=False)
+    products.to_parquet(products_parquet, index=False)
+    UserLeaderboard.from_ratings(ratings).save(user_activity)
+    return {
+        "ratings": (column_memory(raw_ratings), column_memory(ratings)),
+        "products": (column_memory(raw_products), column_memory(products)),
+    }
+
+
+def _is_fresh(parquet_path, csv_path):
+    # Parquet copy exists and was written after the CSV last changed
+    if not os.path.exists(parquet_path):
+        return False
+    return not os.path.exists(csv_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+
+
+def load_ratings():
+    if _is_fresh(RATINGS_PARQUET, RATINGS_CSV):
+        # Parquet only keeps string dictionaries: integer columns (product_id) are encoded again
+        return compact_dtypes(pd.read_parquet(RATINGS_PARQUET), RATINGS_CATEGORICAL_COLUMNS)
+    return compact_dtypes(read_ratings_csv(), RATINGS_CATEGORICAL_COLUMNS)
+
+
+def load_products():
+    if _is_fresh(PRODUCTS_PARQUET, PRODUCTS_CSV):
+        return pd.read_parquet(PRODUCTS_PARQUET)
+    return compact_dtypes(read_products_csv())
+
+
+# === 🔎 Product lookups ===
+class ProductIndex:
+    """product_id -> row position of ``products`` via a sorted id array and ``searchsorted``.
+
+    Duplicate ids resolve to their first row, like ``products_df[...].values[0]`` did.
+    """
+
+    def __init__(self, products):
+        self.products = products
+        self._ids, self._rows = np.unique(products['product_id'].values, return_index=True)
+
+    def positions(self, product_ids):
+        # Row positions of ``product_ids``, -1 where the id is not in the catalog
+        product_ids = np.asarray(product_ids)
+        slots = np.searchsorted(self._ids, product_ids)
+        slots = np.minimum(slots, len(self._ids) - 1)
+        found = self._ids[slots] == product_ids
+        return np.where(found, self._rows[slots], -1)
+
+    def position(self, product_id):
+        return int(self.positions([product_id])[0])
+
+    def __contains__(self, product_id):
+        return self.position(product_id) >= 0
+
+    def lookup(self, product_id):
+        # Metadata row of one product, None when unknown
+        position = self.position(product_id)
+        return self.products.iloc[position] if position >= 0 else None
+
+    def lookup_many(self, product_ids):
+        """Metadata rows for ``product_ids`` in one gather, input order kept, unknown ids dropped."""
+        positions = self.positions(product_ids)
+        return self.products.iloc[positions[positions >= 0]]
+
+
+# === 👤 Per-user rating history ===
+class UserHistoryIndex:
+    """Ratings grouped by user in CSR layout: the history of the i-th user is
+    ``product_ids[offsets[i]:offsets[i + 1]]`` (same for ``ratings``).
+
+    Rows are sorted stably, so each user's slice keeps the file order (oldest first).
+    """
+
+    def __init__(self, ratings):
+        order = np.argsort(ratings['user_id'].values, kind='stable')
+        sorted_users = ratings['user_id'].values[order]
+        self.user_ids, starts = np.unique(sorted_users, return_index=True)
+        self.offsets = np.append(starts, len(order))
+        self.product_ids = decode(ratings['product_id'], order)
+        self.ratings = ratings['rating'].values[order]
+        self.user_names = decode(ratings['user'], order[starts])
+
+    def _user_slot(self, user_id):
+        slot = int(np.searchsorted(self.user_ids, user_id))
+        if slot < len(self.user_ids) and self.user_ids[slot] == user_id:
+            return slot
+        return -1
+
+    def history(self, user_id):
+        # (product_ids, ratings) of the user, empty arrays for unknown users
+        slot = self._user_slot(user_id)
+        if slot < 0:
+            return self.product_ids[:0], self.ratings[:0]
+        start, stop = self.offsets[slot], self.offsets[slot + 1]
+        return self.product_ids[start:stop], self.ratings[start:stop]
+
+    def user_name(self, user_id):
+        slot = self._user_slot(user_id)
+        return self.user_names[slot] if slot >= 0 else None
+
+    def positive_items(self, user_id, min_rating=3):
+        """Product ids the user rated ``min_rating`` or higher."""
+        product_ids, ratings = self.history(user_id)
+        return np.unique(product_ids[ratings >= min_rating])
+
+    def _distinct(self, user_id):
+        # Repeated (product, rating) pairs collapse onto their first occurrence
+        product_ids, ratings = self.history(user_id)
+        duplicated = pd.DataFrame({'product_id': product_ids, 'rating': ratings}).duplicated().values
+        return product_ids[~duplicated], ratings[~duplicated]
+
+    def lowest_rated(self, user_id, n=100):
+        """Up to ``n`` product ids, lowest rating first, ties in file order."""
+        product_ids, ratings = self._distinct(user_id)
+        return product_ids[np.argsort(ratings, kind='stable')[:n]]
+
+    def most_recent(self, user_id, n=100):
+        """Up to ``n`` product ids, latest rating first."""
+        product_ids, _ = self._distinct(user_id)
+        return product_ids[::-1][:n]
+
+
+# === 📝 Rating log ===
+def append_ratings(rows, path=RATING_LOG_CSV):
+    """Append ``(user_id, product_id, rating, user)`` rows to the rating log in one write."""
+    buffer = io.StringIO()
+    pd.DataFrame(list(rows), columns=list(RATING_LOG_COLUMNS)).to_csv(buffer, header=False, index=False)
+    # O_APPEND: concurrent writers (sessions, the service) never interleave within a write
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, buffer.getvalue().encode())
+    finally:
+        os.close(fd)
+
+
+class RatingLog:
+    """The rating log's rows, read incrementally: ``refresh`` parses only what was appended
+    since the previous call, up to the last complete line.
+    """
+
+    def __init__(self, path=RATING_LOG_CSV):
+        self.path = path
+        self.offset = 0
+        self.rows = self._frame(None)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _frame(data):
+        columns = list(RATING_LOG_COLUMNS)
+        if data is None:
+            return pd.DataFrame({col: pd.Series(dtype=object if col == 'user' else np.int64) for col in columns})
+        return pd.read_csv(io.BytesIO(data), names=columns, header=None)
+
+    def refresh(self):
+        """Rows appended since the last call (all rows again if the log was replaced by a shorter one)."""
+        with self._lock:
+            try:
+                size = os.path.getsize(self.path)
+            except FileNotFoundError:
+                size = 0
+            if size < self.offset:
+                self.offset, self.rows = 0, self._frame(None)
+            if size == self.offset:
+                return self.rows.iloc[:0]
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                data = f.read(size - self.offset)
+            end = data.rfind(b"\n") + 1  # a line still being written is picked up next time
+            if not end:
+                return self.rows.iloc[:0]
+            new_rows = self._frame(data[:end])
+            self.offset += end
+            self.rows = pd.concat([self.rows, new_rows], ignore_index=True)
+            return new_rows
+
+    def ratings(self, user_id):
+        """(product_ids, ratings) the user logged, the latest rating of each product only."""
+        rows = self.rows[self.rows['user_id'].values == user_id].drop_duplicates('product_id', keep='last')
+        return rows['product_id'].values, rows['rating'].values
+
+
+# === 🏆 User leaderboard ===
+class UserLeaderboard:
+    """Rating counts per ``(user_id, user)`` pair, ranked like ``value_counts()``:
+    most ratings first, ties in order of first appearance in the ratings file.
+
+    ``n_ratings`` is how many rating rows the counts cover, so rows appended to the
+    file later can be folded in with ``update`` instead of recounting everything.
+    """
+
+    def __init__(self, activity, n_ratings, n_mapped=1000):
+        self.activity = activity
+        self.n_ratings = n_ratings
+
+        # Masked names ("t*****n") are left out of the name picker
+        named = activity[~activity['user'].str.contains('*', regex=False, na=True)]
+        by_name = named.groupby('user', sort=False).agg(count=('count', 'sum'), first_seen=('first_seen', 'min'))
+        self._names = by_name.sort_values(['count', 'first_seen'], ascending=[False, True]).index.values
+
+        by_id = activity.groupby('user_id', sort=False).agg(count=('count', 'sum'), first_seen=('first_seen', 'min'))
+        self._user_ids = by_id.sort_values(['count', 'first_seen'], ascending=[False, True]).index.values
+
+        # Account behind each of the first ``n_mapped`` names, i.e. everything a picker offers
+        self._name_to_user_id = self._most_active(self._names[:n_mapped])
+
+    def _most_active(self, names):
+        # A name shared by several accounts maps to the one with the most ratings (lowest id on ties)
+        rows = self.activity[self.activity['user'].isin(names)]
+        rows = rows.sort_values(['count', 'user_id'], ascending=[False, True]).drop_duplicates(subset='user')
+        return dict(zip(rows['user'].tolist(), rows['user_id'].tolist()))
+
+    @staticmethod
+    def _count(ratings, start=0):
+        pairs = pd.DataFrame({
+            'user_id': ratings['user_id'].values,
+            'user': decode(ratings['user']),
+            'first_seen': np.arange(start, start + len(ratings)),
+        })
+        return pairs.groupby(['user_id', 'user'], sort=False, dropna=False).agg(
+            count=('first_seen', 'size'), first_seen=('first_seen', 'min')).reset_index()
+
+    @classmethod
+    def from_ratings(cls, ratings):
+        return cls(cls._count(ratings), len(ratings))
+
+    def update(self, new_ratings):
+        """Leaderboard covering ``new_ratings`` appended after the rows already counted."""
+        if len(new_ratings) == 0:
+            return self
+        activity = pd.concat([self.activity, self._count(new_ratings, self.n_ratings)], ignore_index=True)
+        activity = activity.groupby(['user_id', 'user'], sort=False, dropna=False).agg(
+            count=('count', 'sum'), first_seen=('first_seen', 'min')).reset_index()
+        return UserLeaderboard(activity, self.n_ratings + len(new_ratings))
+
+    def top_names(self, n=100):
+        return self._names[:n].tolist()
+
+    def top_user_ids(self, n=100):
+        return self._user_ids[:n].tolist()
+
+    def most_active_user_id(self, name):
+        user_id = self._name_to_user_id.get(name)
+        if user_id is None:
+            user_id = self._most_active([name]).get(name)
+        return user_id
+
+    def save(self, path=USER_ACTIVITY_PARQUET):
+        table = pa.Table.from_pandas(self.activity, preserve_index=False)
+        metadata = {**(table.schema.metadata or {}), b"n_ratings": str(self.n_ratings).encode()}
+        pq.write_table(table.replace_schema_metadata(metadata), path)
+
+    @classmethod
+    def load(cls, path=USER_ACTIVITY_PARQUET):
+        table = pq.read_table(path)
+        return cls(table.to_pandas(), int(table.schema.metadata[b"n_ratings"]))
+
+
+def load_leaderboard(ratings, path=USER_ACTIVITY_PARQUET):
+    # Saved counts topped up with any rows appended since; rebuilt when there are none
+    # or the ratings file shrank (replaced rather than appended to)
+    if os.path.exists(path):
+        leaderboard = UserLeaderboard.load(path)
+        if leaderboard.n_ratings <= len(ratings):
+            return leaderboard.update(ratings.iloc[leaderboard.n_ratings:])
+    return UserLeaderboard.from_ratings(ratings)
+
+
+def refresh_leaderboard(path=USER_ACTIVITY_PARQUET):
+    """Fold the rating rows appended since the last save into the saved leaderboard."""
+    ratings = load_ratings()
+    load_leaderboard(ratings, path).save(path)
+    return len(ratings)
+
+
+# === 🗃️ Shared tables ===
+# Every page imports these instead of keeping its own cached copy: modules stay in
+# sys.modules across Streamlit reruns, so each table is built once per process and
+# handed out by reference (no per-rerun unpickling like st.cache_data), read-only.
+# Product tables are rebuilt when the products file changes (new products appended).
+_tables = {}
+_versions = {}
+_lock = threading.RLock()
+
+
+def freeze_frame(df):
+    """Same columns as ``df`` on read-only NumPy buffers, without copying them.
+
+    Writes into its buffers (``.loc[...] = ``, ``.iloc[...] = ``, ``.values[...] = ``) then
+    raise instead of silently changing what every other session sees. Structural in-place
+    changes (``df["x"] = ``, ``insert``, ``sort_values(inplace=True)``) are not caught and
+    still reach every session: copy the frame before reshaping it. Extension columns
+    (categorical, Arrow-backed strings) are passed through as they are.
+    """
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, np.dtype):
+            values = values.to_numpy()
+            values.flags.writeable = False
+        columns[col] = values
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def freeze_arrays(obj):
+    # Index objects: make every NumPy attribute read-only
+    for value in vars(obj).values():
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+    return obj
+
+
+def _load_once(name, loader, version=None):
+    table = _tables.get(name)
+    if table is None or _versions.get(name) != version:
+        with _lock:
+            table = _tables.get(name)
+            if table is None or _versions.get(name) != version:
+                table = loader()
+                _tables[name], _versions[name] = table, version
+    return table
+
+
+def products_version():
+    # Size and mtime of both product files, whichever load_products reads
+    stats = []
+    for path in (PRODUCTS_PARQUET, PRODUCTS_CSV):
+        try:
+            stat = os.stat(path)
+            stats.append((stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            stats.append(None)
+    return tuple(stats)
+
+
+def get_ratings():
+    return _load_once("ratings", lambda: freeze_frame(load_ratings()))
+
+
+def get_products():
+    return _load_once("products", lambda: freeze_frame(load_products()), products_version())
+
+
+def get_product_index():
+    return _load_once("product_index", lambda: freeze_arrays(ProductIndex(get_products())), products_version())
+
+
+def get_history_index():
+    return _load_once("history_index", lambda: freeze_arrays(UserHistoryIndex(get_ratings())))
+
+
+def get_leaderboard():
+    return _load_once("leaderboard", lambda: load_leaderboard(get_ratings()))
+
+
+def get_rating_log():
+    log = _load_once("rating_log", RatingLog)
+    log.refresh()
+    return log
+
+
+def positive_items(user_id, min_rating=3):
+    """Product ids the user rated ``min_rating`` or higher, in the ratings file or the rating log."""
+    positives = get_history_index().positive_items(user_id, min_rating)
+    product_ids, ratings = get_rating_log().ratings(user_id)
+    if len(product_ids):
+        positives = np.union1d(positives, product_ids[ratings >= min_rating])
+    return positives
+
+
+def get_overall():
+    """Ratings joined with product metadata; only built when a page asks for it."""
+    def load():
+        ratings = get_ratings()
+        ratings = ratings.assign(product_id=decode(ratings['product_id']))  # join on the plain ids
+        overall = pd.merge(ratings, get_products(), on='product_id', how='left')
+        overall = overall.rename(columns={'rating_x': 'user_rating', 'rating_y': 'product_overall_rating'})
+        return freeze_frame(overall)
+    return _load_once("overall", load, products_version())
+
+
+def _nbytes(table):
+    if isinstance(table, pd.DataFrame):
+        return int(table.memory_usage(deep=True).sum())
+    # Index objects: count their own arrays, not the frames they point at
+    return sum(value.nbytes for value in vars(table).values() if isinstance(value, np.ndarray))
+
+
+def memory_report():
+    """(name, rows, bytes) of every table built so far in this process."""
+    return [(name, len(table) if isinstance(table, pd.DataFrame) else None, _nbytes(table))
+            for name, table in sorted(_tables.items())]
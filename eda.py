@@ -5,6 +5,7 @@ import matplotlib.pyplot as plt
 from wordcloud import WordCloud
 import altair as alt
 import plotly.express as px
+from data_store import get_overall, get_products, get_ratings
 
 # Set language from session
 language = st.session_state.get("language", "English")
@@ -12,18 +13,9 @@ language = st.session_state.get("language", "English")
 dataset_name_user_rating = "Products_ThoiTrangNam_rating.csv"
 dataset_name_products = "Products_ThoiTrangNam_downsize.csv"
 # === 🧹 Load the Data ===
-@st.cache_data
-def load_data():
-    user_rating = pd.read_csv(dataset_name_user_rating)
-    products = pd.read_csv(dataset_name_products)
-    products =products.drop(columns=['Unnamed: 0'])
-    overall = pd.merge(user_rating, products, on='product_id', how = 'left')
-    overall = overall.rename(columns={'rating_x': 'user_rating', 'rating_y': 'product_overall_rating'})
-    
-    
-    return user_rating, products, overall
-
-user_rating_df, products_df, overall_df = load_data()
+# Shared per-process tables from data_store; the ratings/products join is built on first use
+user_rating_df = get_ratings()
+products_df = get_products()
 
 selected_dataset = st.sidebar.selectbox(
     "Choose a dataset to analyze:" if language == "English" else "Chọn dữ liệu để phân tích:",
@@ -38,7 +30,7 @@ if (selected_dataset == "Products Ratings"):
 elif (selected_dataset == "User Ratings"): 
     dataset = user_rating_df
 else:
-    dataset = overall_df
+    dataset = get_overall()
 text = ""
 # === 🧾 Dataset Summary ===
 if language == "English":
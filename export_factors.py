@@ -0,0 +1,18 @@
+import argparse
+import time
+
+from model_registry import SVD_FACTORS_DIR_ENV, export_factors
+
+# Offline step: write the SVD factors, id lookups and catalog blocks as .npy files.
+# Start the app, service or batch workers with SVD_FACTORS_DIR=<out-dir> and every process
+# memory-maps these files instead of unpickling its own copy of surprise.pkl.
+# Re-run whenever surprise.pkl changes (stale exports are ignored).
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export SVD factors for zero-copy sharing between processes")
+    parser.add_argument("--out-dir", default="svd_factors")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    export_factors(args.out_dir)
+    print(f"Exported factors to {args.out_dir} in {time.perf_counter() - start:.1f}s; "
+          f"run with {SVD_FACTORS_DIR_ENV}={args.out_dir}")
@@ -0,0 +1,30 @@
+import argparse
+import time
+
+from data_store import PRODUCTS_PARQUET, RATINGS_PARQUET, USER_ACTIVITY_PARQUET, ingest, refresh_leaderboard
+
+# Offline step: convert the rating and product CSVs into typed Parquet files.
+# Re-run whenever the CSVs change; the pages fall back to the CSVs until then.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the datasets to Parquet and build the user leaderboard")
+    parser.add_argument("--leaderboard", action="store_true",
+                        help="Only fold ratings appended since the last run into the user leaderboard")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.leaderboard:
+        n_ratings = refresh_leaderboard()
+        print(f"Updated {USER_ACTIVITY_PARQUET} to {n_ratings} ratings in {time.perf_counter() - start:.1f}s")
+    else:
+        footprints = ingest()
+        print(f"Wrote {RATINGS_PARQUET}, {PRODUCTS_PARQUET} and {USER_ACTIVITY_PARQUET} in {time.perf_counter() - start:.1f}s")
+
+        # In-memory footprint: as read from the CSV vs. as the pages hold it
+        print(f"{'column':>28} {'CSV dtype':>12} {'MB':>8}   {'typed dtype':>12} {'MB':>8}")
+        for table, (before, after) in footprints.items():
+            for col, (dtype, nbytes) in before.items():
+                new_dtype, new_nbytes = after[col]
+                print(f"{table + '.' + col:>28} {dtype:>12} {nbytes / 2**20:>8.1f}   {new_dtype:>12} {new_nbytes / 2**20:>8.1f}")
+            total_before = sum(nbytes for _, nbytes in before.values())
+            total_after = sum(nbytes for _, nbytes in after.values())
+            print(f"{table + ' total':>28} {'':>12} {total_before / 2**20:>8.1f}   {'':>12} {total_after / 2**20:>8.1f}")
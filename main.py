@@ -1,7 +1,14 @@
+import os
+import uuid
+
+import pandas as pd
 import streamlit as st
 from streamlit_extras.switch_page_button import switch_page  # optional for page control
 from PIL import Image
 
+from rerun_profiler import RerunProfiler, profile_mode
+from stage_metrics import current_trace, export_metrics, span, start_trace
+
 # Set language (stores in session state)
 if "language" not in st.session_state:
     st.session_state.language = "Tiếng Việt"
@@ -32,7 +39,19 @@ content_based_filtering = st.Page("content_based_filtering.py", title="Content-b
 collaborative_filtering = st.Page("collaborative_filtering.py", title="Collaborative Filtering", icon="🛗")
 
 pg = st.navigation([introduction, user_guide, eda, content_based_filtering, collaborative_filtering])
-pg.run()
+start_trace()
+# Opt-in profile of the page run: PROFILE_RERUNS=cprofile|sample or ?profile=cprofile|sample
+session_tag = st.session_state.setdefault("profile_session", uuid.uuid4().hex[:8])
+with span("page.rerun"), RerunProfiler(profile_mode(st.query_params.get("profile")), pg.url_path or "home", session_tag):
+    pg.run()
+
+# === ⏱️ Stage timings of this rerun (opt-in: ?debug=1 or DEBUG_TIMINGS=1) ===
+if st.query_params.get("debug") == "1" or os.environ.get("DEBUG_TIMINGS") == "1":
+    with st.sidebar.expander("⏱️ Stage timings", expanded=True):
+        timings = pd.DataFrame(current_trace(), columns=["stage", "ms"])
+        timings["ms"] = (timings["ms"] * 1000).round(2)
+        st.dataframe(timings, hide_index=True, use_container_width=True)
+export_metrics()  # Prometheus text to $STAGE_METRICS_FILE, when set
 st.sidebar.write("""Made By 
                  
                     Bùi Khánh An & Trần Thanh Trúc""")
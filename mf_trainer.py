@@ -0,0 +1,239 @@
+import os
+import pickle
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+from cf_engine import SVDScorer
+from data_store import decode, get_rating_log, load_ratings
+
+# Solvers of the per-user / per-item least-squares subproblems:
+#   als  exact: normal equations per row (or their count x count dual for rows with
+#        fewer ratings than factors), solved in batched LAPACK calls
+#   cg   a few conjugate-gradient steps warm-started from the previous sweep (ALS-CG);
+#        never forms the k x k matrices, O(ratings * k) per step
+SOLVERS = ("als", "cg")
+
+# Memory for the k x k normal-equation matrices of one exact-ALS block; blocks of
+# ``block_ratings`` ratings are sized to stay in the CPU caches
+GRAM_BLOCK_BYTES = 64 * 2**20
+
+
+# === 🏋️ Biased matrix factorisation by alternating least squares ===
+class RatingMatrix:
+    """Ratings grouped by user and by item in CSR layout, over dense inner ids.
+
+    Inner ids follow the sorted raw ids. Repeated (user, item) ratings are kept as
+    separate rows, as surprise trains on them.
+    """
+
+    def __init__(self, user_ids, product_ids, ratings):
+        self.user_ids, users = np.unique(np.asarray(user_ids), return_inverse=True)
+        self.item_ids, items = np.unique(np.asarray(product_ids), return_inverse=True)
+        ratings = np.asarray(ratings, dtype=np.float64)
+        self.n_ratings = len(ratings)
+        self.global_mean = float(ratings.mean())
+        self.by_user = _group(users, items, ratings, len(self.user_ids))
+        self.by_item = _group(items, users, ratings, len(self.item_ids))
+
+
+def _group(rows, cols, values, n_rows):
+    # (indptr, cols, values) sorted by row, file order kept within a row
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols[order], values[order]
+
+
+def _count_blocks(indptr, target, max_rows):
+    # Row arrays of the same rating count, about ``target`` ratings (and at most ``max_rows``
+    # rows) each: their ratings gather into dense (rows, count, k) tensors
+    counts = np.diff(indptr)
+    order = np.argsort(counts, kind='stable')
+    bounds = np.flatnonzero(np.diff(counts[order])) + 1
+    blocks = []
+    for rows in np.split(order, bounds):
+        if len(rows):
+            step = max(1, min(target // int(counts[rows[0]]), max_rows))
+            blocks.extend(rows[i:i + step] for i in range(0, len(rows), step))
+    return blocks
+
+
+def _design(grouped, rows, other_x, other_b, global_mean, biased):
+    # Gathered factors x (rows, count, k [+ 1]) and targets y (rows, count, 1) of ``rows``
+    indptr, cols, values = grouped
+    positions = indptr[rows][:, None] + np.arange(indptr[rows[0] + 1] - indptr[rows[0]])
+    c = cols[positions]
+    y = values[positions] - global_mean - other_b[c] if biased else values[positions]
+    return other_x[c], y[:, :, None]
+
+
+def _solve_exact(x, y, reg):
+    xt = x.transpose(0, 2, 1)
+    count, width = x.shape[1], x.shape[2]
+    if count >= width:
+        gram = xt @ x
+        gram[:, np.arange(width), np.arange(width)] += reg * count
+        return np.linalg.solve(gram, xt @ y)[:, :, 0]
+    # Fewer ratings than factors (most rows of a long-tailed dataset): the same solution
+    # from the count x count system, (X'X + lI)^-1 X'y = X'(XX' + lI)^-1 y
+    kernel = x @ xt
+    kernel[:, np.arange(count), np.arange(count)] += reg * count
+    dual = y / kernel if count == 1 else np.linalg.solve(kernel, y)
+    return (xt @ dual)[:, :, 0]
+
+
+def _solve_cg(x, y, reg, current, steps):
+    damping = reg * x.shape[1]
+
+    def apply(v):
+        return np.einsum('ncd,nc->nd', x, np.einsum('ncd,nd->nc', x, v)) + damping * v
+
+    w = current.copy()
+    r = np.einsum('ncd,nc->nd', x, y[:, :, 0]) - apply(w)
+    p = r.copy()
+    rs = np.einsum('ni,ni->n', r, r)
+    for _ in range(steps):
+        ap = apply(p)
+        denominator = np.einsum('ni,ni->n', p, ap)
+        alpha = np.divide(rs, denominator, out=np.zeros_like(rs), where=denominator > 0)
+        w += alpha[:, None] * p
+        r -= alpha[:, None] * ap
+        rs_new = np.einsum('ni,ni->n', r, r)
+        beta = np.divide(rs_new, rs, out=np.zeros_like(rs), where=rs > 0)
+        p = r + beta[:, None] * p
+        rs = rs_new
+    return w
+
+
+class ALSTrainer:
+    """Fits ``rating ~ global_mean + bu + bi + qi . pu`` (``qi . pu`` when not biased).
+
+    The objective is surprise's SVD objective: squared error plus ``reg`` times the squared
+    norms, once per rating a user or item has (so ``reg * n`` per row, as in ALS-WR). Each
+    sweep solves every user with the items fixed, then every item with the users fixed.
+    Rows with the same number of ratings are solved together as batched matrix products,
+    in blocks spread over ``n_threads`` threads; NumPy releases the GIL in the gathers,
+    products and LAPACK calls, and BLAS is kept to one thread per worker so the pool does
+    not oversubscribe the cores.
+    """
+
+    def __init__(self, n_factors=100, n_iterations=15, reg=0.05, biased=True, solver="als",
+                 cg_steps=3, n_threads=None, block_ratings=2048, init_std_dev=0.1, seed=0):
+        if solver not in SOLVERS:
+            raise ValueError(f"Unknown solver {solver!r}, expected one of {SOLVERS}")
+        self.n_factors = n_factors
+        self.n_iterations = n_iterations
+        self.reg = reg
+        self.biased = biased
+        self.solver = solver
+        self.cg_steps = cg_steps
+        self.n_threads = n_threads or os.cpu_count()
+        self.block_ratings = block_ratings
+        self.init_std_dev = init_std_dev
+        self.seed = seed
+
+    def fit(self, matrix, callback=None):
+        """Factors of ``matrix`` (a RatingMatrix) as an SVDScorer.
+
+        ``callback(iteration, train_rmse, seconds)`` is called after every sweep.
+        """
+        rng = np.random.default_rng(self.seed)
+        pu = rng.normal(0, self.init_std_dev, (len(matrix.user_ids), self.n_factors))
+        qi = rng.normal(0, self.init_std_dev, (len(matrix.item_ids), self.n_factors))
+        bu, bi = np.zeros(len(pu)), np.zeros(len(qi))
+
+        user_blocks, item_blocks = self._blocks(matrix.by_user), self._blocks(matrix.by_item)
+        with threadpool_limits(limits=1, user_api="blas"), ThreadPoolExecutor(self.n_threads) as pool:
+            for iteration in range(self.n_iterations):
+                start = time.perf_counter()
+                self._sweep(pool, matrix.by_user, user_blocks, pu, bu, qi, bi, matrix.global_mean)
+                self._sweep(pool, matrix.by_item, item_blocks, qi, bi, pu, bu, matrix.global_mean)
+                if callback is not None:
+                    callback(iteration, train_rmse(matrix, pu, qi, bu, bi, self.biased),
+                             time.perf_counter() - start)
+
+        return SVDScorer(pu, qi, bu, bi, matrix.global_mean, matrix.user_ids, matrix.item_ids, biased=self.biased)
+
+    def _blocks(self, grouped):
+        width = self.n_factors + self.biased
+        max_rows = GRAM_BLOCK_BYTES // (width * width * 8) if self.solver == "als" else self.block_ratings
+        return _count_blocks(grouped[0], self.block_ratings, max_rows)
+
+    def _sweep(self, pool, grouped, blocks, own_f, own_b, other_f, other_b, global_mean):
+        # Solve every row of own_f / own_b in place, the other side held fixed; with biases
+        # its rows get a constant 1 column, the coefficient of own_b
+        other_x = np.hstack([other_f, np.ones((len(other_f), 1))]) if self.biased else other_f
+
+        def solve(rows):
+            x, y = _design(grouped, rows, other_x, other_b, global_mean, self.biased)
+            if self.solver == "als":
+                w = _solve_exact(x, y, self.reg)
+            else:
+                current = own_f[rows]
+                if self.biased:
+                    current = np.hstack([current, own_b[rows, None]])
+                w = _solve_cg(x, y, self.reg, current, self.cg_steps)
+            own_f[rows] = w[:, :self.n_factors]
+            if self.biased:
+                own_b[rows] = w[:, -1]
+
+        # Blocks hold disjoint rows, so the threads never write the same one
+        list(pool.map(solve, blocks))
+
+
+def train_rmse(matrix, pu, qi, bu, bi, biased=True):
+    indptr, items, ratings = matrix.by_user
+    users = np.repeat(np.arange(len(pu)), np.diff(indptr))
+    est = np.einsum('ni,ni->n', pu[users], qi[items])
+    if biased:
+        est += matrix.global_mean + bu[users] + bi[items]
+    return float(np.sqrt(np.mean((est - ratings) ** 2)))
+
+
+# === 📥 Training data and the surprise.pkl the app loads ===
+def training_ratings(include_log=False):
+    """(user_id, product_id, rating) rows of the ratings table, plus the rating log if asked."""
+    ratings = load_ratings()
+    user_ids, product_ids, values = ratings['user_id'].values, decode(ratings['product_id']), ratings['rating'].values
+    if include_log:
+        log = get_rating_log().rows
+        user_ids = np.concatenate([user_ids, log['user_id'].values])
+        product_ids = np.concatenate([product_ids, log['product_id'].values])
+        values = np.concatenate([values, log['rating'].values])
+    return RatingMatrix(user_ids, product_ids, values)
+
+
+def to_surprise(scorer, matrix, n_epochs, reg, rating_scale=(1, 5)):
+    """A fitted ``surprise.SVD`` holding ``scorer``'s factors, interchangeable with a trained one."""
+    from surprise import SVD, Trainset
+
+    ur, ir = defaultdict(list), defaultdict(list)
+    for grouped, target in ((matrix.by_user, ur), (matrix.by_item, ir)):
+        indptr, cols, values = grouped
+        cols, values = cols.tolist(), values.tolist()
+        for row in range(len(indptr) - 1):
+            lo, hi = indptr[row], indptr[row + 1]
+            target[row] = list(zip(cols[lo:hi], values[lo:hi]))
+    trainset = Trainset(
+        ur, ir, len(matrix.user_ids), len(matrix.item_ids), matrix.n_ratings, rating_scale,
+        {raw: inner for inner, raw in enumerate(matrix.user_ids.tolist())},
+        {raw: inner for inner, raw in enumerate(matrix.item_ids.tolist())},
+    )
+    trainset._global_mean = matrix.global_mean
+
+    model = SVD(n_factors=scorer.pu.shape[1], n_epochs=n_epochs, biased=scorer.biased, reg_all=reg)
+    model.trainset = trainset
+    model.pu, model.qi, model.bu, model.bi = scorer.pu, scorer.qi, scorer.bu, scorer.bi
+    return model
+
+
+def save_surprise(model, path):
+    # Renamed into place: running apps reload it on the next request, never half-written
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
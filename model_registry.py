@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+
+import scipy.sparse
+
+from cf_engine import CategoryItemBlocks, MIPSIndex, SVDScorer
+from content_engine import NEIGHBOUR_DISTANCES_FILE, NEIGHBOUR_INDICES_FILE, build_ann_index, load_neighbour_table
+from data_store import freeze_arrays, freeze_frame, get_products, get_rating_log, products_version
+
+# === 📦 Model artifacts ===
+SURPRISE_MODEL_FILE = "surprise.pkl"
+CONTENT_MODEL_FILE = "gensim.pkl"
+TFIDF_MATRIX_FILE = "tfidf_matrix.npz"
+
+# Directory written by export_factors.py; when set, every process memory-maps the same
+# factor files instead of unpickling its own copy of surprise.pkl
+SVD_FACTORS_DIR_ENV = "SVD_FACTORS_DIR"
+
+# Rating noise variance of the fold-in update: larger values trust the trained factors more
+FOLD_IN_NOISE_VAR = float(os.environ.get("SVD_FOLD_IN_NOISE_VAR", 1.0))
+
+# Streamlit re-executes the page scripts on every interaction, but imported modules
+# stay in sys.modules, so everything below is loaded once per process and shared.
+# Each artifact is stored with the version of the files it came from and reloaded
+# when they are rewritten on disk.
+_artifacts = {}
+_lock = threading.RLock()
+
+
+def _load_once(name, loader, version=None):
+    entry = _artifacts.get(name)
+    if entry is None or entry[0] != version:
+        with _lock:
+            entry = _artifacts.get(name)
+            if entry is None or entry[0] != version:
+                entry = (version, loader())
+                _artifacts[name] = entry
+    return entry[1]
+
+
+def _freeze(*arrays):
+    # Shared between every session: make accidental in-place writes raise
+    for array in arrays:
+        array.flags.writeable = False
+
+
+def loaded_artifacts():
+    return sorted(_artifacts)
+
+
+def artifact_version(*paths):
+    """Short hash of the size and mtime of ``paths``; changes whenever one is rewritten."""
+    stats = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stats.append((path, stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            stats.append((path, None, None))
+    return hashlib.sha1(repr(stats).encode()).hexdigest()[:12]
+
+
+def collaborative_version():
+    return artifact_version(SURPRISE_MODEL_FILE)
+
+
+def content_version():
+    return artifact_version(TFIDF_MATRIX_FILE, CONTENT_MODEL_FILE, NEIGHBOUR_INDICES_FILE, NEIGHBOUR_DISTANCES_FILE)
+
+
+# === 🤝 Collaborative filtering engine ===
+def get_svd_model():
+    def load():
+        with open(SURPRISE_MODEL_FILE, "rb") as f:
+            return pickle.load(f)
+    return _load_once("svd_model", load, collaborative_version())
+
+
+def _shared_factors_dir(*parts):
+    # Exported factor directory (or a part of it), None unless it exists for the current surprise.pkl
+    directory = os.environ.get(SVD_FACTORS_DIR_ENV)
+    if not directory or not os.path.exists(os.path.join(directory, "scorer.json")):
+        return None
+    with open(os.path.join(directory, "scorer.json")) as f:
+        if json.load(f).get("version") != collaborative_version():
+            return None
+    path = os.path.join(directory, *parts)
+    return path if os.path.exists(path) else None
+
+
+def get_svd_scorer():
+    """The SVD scorer, with every user of the rating log folded in."""
+    def load():
+        shared = _shared_factors_dir()
+        if shared is not None:
+            return SVDScorer.load(shared)[0]
+        scorer = SVDScorer.from_surprise(get_svd_model())
+        _freeze(scorer.pu, scorer.qi, scorer.bu, scorer.bi)
+        return scorer
+    scorer = _load_once("svd_scorer", load, collaborative_version())
+    _fold_in_rating_log(scorer)
+    return scorer
+
+
+# (scorer, rating log rows folded into it so far)
+_log_folded = [None, 0]
+
+
+def _fold_in_rating_log(scorer):
+    log = get_rating_log()
+    if _log_folded[0] is scorer and _log_folded[1] == len(log.rows):
+        return
+    with _lock:
+        rows = log.rows
+        if _log_folded[0] is not scorer or _log_folded[1] > len(rows):  # new model or replaced log
+            scorer.forget_folded()
+            _log_folded[:] = [scorer, 0]
+        for user_id in rows['user_id'].iloc[_log_folded[1]:].unique():
+            scorer.fold_in(user_id, *log.ratings(user_id), noise_var=FOLD_IN_NOISE_VAR)
+        _log_folded[1] = len(rows)
+
+
+def fold_generation(user_id):
+    """Changes folded into ``user_id``'s factors, the rating log's new lines included; part of
+    the collaborative cache key, so only the users with new ratings get recomputed.
+    """
+    return get_svd_scorer().fold_generation(user_id)
+
+
+def fold_in_user(user_id):
+    """Fold ``user_id``'s logged ratings into their factors now; returns the ratings used.
+
+    ``get_svd_scorer`` folds every new line of the rating log in, so this only counts them.
+    """
+    scorer = get_svd_scorer()
+    product_ids, _ = get_rating_log().ratings(user_id)
+    return int((scorer.item_index(product_ids) >= 0).sum())
+
+
+def get_mips_index():
+    # Approximate top-K for "All" requests, off unless CF_MIPS_PROBES is set (e.g. CF_MIPS_PROBES=4)
+    n_probe = int(os.environ.get("CF_MIPS_PROBES", 0))
+    if not n_probe:
+        return None
+    return _load_once("mips_index", lambda: MIPSIndex(get_svd_scorer(), n_probe=n_probe), collaborative_version())
+
+
+def get_catalog_blocks(include_unknown=False):
+    """(catalog, item_blocks): one row per named product, its factors grouped by category.
+
+    ``include_unknown`` keeps catalog items the model never saw (scored from the global mean).
+    The blocks score through ``get_svd_scorer()``, so logged ratings are folded in first.
+    """
+    scorer = get_svd_scorer()
+
+    def load():
+        products = get_products()
+        catalog = products.drop(columns='rating', errors='ignore').drop_duplicates(subset='product_id').reset_index(drop=True)
+        shared = _shared_factors_dir(_blocks_dir_name(include_unknown))
+        if shared is not None:
+            item_blocks, metadata = CategoryItemBlocks.load(shared, scorer)
+            if metadata.get("n_catalog") == len(catalog):
+                return freeze_frame(catalog), item_blocks
+        item_blocks = CategoryItemBlocks(
+            scorer,
+            catalog['product_id'].values,
+            catalog['sub_category'].values,
+            mask=catalog['product_name'].notna().values,
+            include_unknown=include_unknown,
+        )
+        return freeze_frame(catalog), freeze_arrays(item_blocks)
+    return _load_once(f"catalog_blocks:{include_unknown}", load, (collaborative_version(), products_version()))
+
+
+def _blocks_dir_name(include_unknown):
+    return "catalog_all_items" if include_unknown else "catalog_known_items"
+
+
+def export_factors(directory):
+    """Write the SVD factors and both catalog block layouts for SVD_FACTORS_DIR to map."""
+    get_svd_scorer().save(directory, version=collaborative_version())
+    for include_unknown in (False, True):
+        catalog, item_blocks = get_catalog_blocks(include_unknown)
+        item_blocks.save(os.path.join(directory, _blocks_dir_name(include_unknown)), n_catalog=len(catalog))
+
+
+# === 🧠 Content-based engine ===
+def get_tfidf_matrix():
+    def load():
+        matrix = scipy.sparse.load_npz(TFIDF_MATRIX_FILE).tocsr()
+        _freeze(matrix.data, matrix.indices, matrix.indptr)
+        return matrix
+    return _load_once("tfidf_matrix", load, content_version())
+
+
+def get_content_model():
+    def load():
+        with open(CONTENT_MODEL_FILE, "rb") as f:
+            return pickle.load(f)
+    return _load_once("content_model", load, content_version())
+
+
+def get_content_index():
+    # Pickled NearestNeighbors unless an approximate backend is configured,
+    # e.g. CONTENT_ANN_BACKEND=ivf CONTENT_ANN_PROBES=8
+    backend = os.environ.get("CONTENT_ANN_BACKEND")
+    if not backend:
+        return get_content_model()
+
+    def load():
+        n_probe = int(os.environ.get("CONTENT_ANN_PROBES", 0))
+        params = {"n_probe": n_probe} if n_probe else {}
+        return build_ann_index(get_tfidf_matrix(), backend, **params)
+    return _load_once(f"content_index:{backend}", load, content_version())
+
+
+def get_neighbour_table():
+    # None until build_neighbours.py has been run for the current TF-IDF matrix
+    return _load_once("neighbour_table", lambda: load_neighbour_table(".", get_tfidf_matrix().shape[0]),
+                      content_version())
+
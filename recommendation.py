@@ -1,10 +1,12 @@
 import streamlit as st
 import pandas as pd
-import pickle
 import numpy as np
-import scipy.sparse
 import base64
 import math
+from data_store import get_history_index, get_leaderboard, get_product_index, get_products, get_ratings
+from model_registry import content_version
+import recommender
+from result_cache import session_recommendations
 # Get user's language choice
 language = st.session_state.get("language", "English")
 
@@ -28,79 +30,24 @@ st.markdown("""
 dataset_name_user_rating = "Products_ThoiTrangNam_rating.csv"
 dataset_name_products = "Products_ThoiTrangNam_downsize.csv"
 
-@st.cache_data
-def load_data():
-    user_rating = pd.read_csv(dataset_name_user_rating)
-    products = pd.read_csv(dataset_name_products)
-    products =products.drop(columns=['Unnamed: 0'])
+# Shared per-process tables from data_store (Parquet copies when ingested, otherwise the CSVs)
+user_rating_df = get_ratings()
+products_df = get_products()
+product_index = get_product_index()
+leaderboard = get_leaderboard()  # top users by activity, for the user pickers
+history_index = get_history_index()
 
-    return user_rating, products
+# === Model set up ===
+# Models come from the process-wide registry and are only loaded by the method that needs them
 
-user_rating_df, products_df = load_data()
+# This page also ranks products the model never saw, and always scores exactly
+COLLAB_OPTIONS = {"include_unknown": True, "use_mips": False}
 
-# === Model set up ===)
-with open('surprise.pkl', 'rb') as f:
-    model = pickle.load(f)
 
-# Load the model
+def collab_filtering(user_id, top_n=5, categories='All'):
+    return recommender.collab_filtering(user_id, top_n, categories, **COLLAB_OPTIONS)
 
-def collab_filtering(user_id, top_n=5, categories = 'All'):
-    # Filter products rated >= 3 by this user (historical data, not used in prediction)
-    user_history = user_rating_df[(user_rating_df['user_id'] == user_id) & (user_rating_df['rating'] >= 3)]
-    
-    # Get all unique product IDs from products_df
-    candidate_products = products_df[['product_id']].drop_duplicates()
-
-    # Predict estimated ratings for each product
-    candidate_products['EstimateScore'] = candidate_products['product_id'].apply(
-        lambda pid: model.predict(user_id, pid).est
-    )
-
-    # Remove products the user has already rated
-    candidate_products = candidate_products[~candidate_products['product_id'].isin(user_history['product_id'])]
-
-    # Join with product info
-    temp = products_df.drop(columns="rating")
-    recommendations = candidate_products.merge(temp, on='product_id', how='left')
-
-    # Drop products with missing names (if any)
-    recommendations = recommendations.dropna(subset=['product_name'])
-    
-    if (categories != "All"):
-        recommendations = recommendations[recommendations["sub_category"] == categories]
-    # Sort by predicted score
-    recommendations["EstimateScore"] = recommendations["EstimateScore"].round(2)
-
-    recommendations = recommendations.sort_values(by='EstimateScore', ascending=False)
-
-    if (len(recommendations) < top_n):
-        return recommendations.head(len(recommendations))
-    return recommendations.head(top_n)
-
-tfidf_matrix = scipy.sparse.load_npz('tfidf_matrix.npz')
-
-with open('gensim.pkl', 'rb') as f:
-    model2 = pickle.load(f)
-
-def content_based_filtering(product_id, top_n=5):
-    try:
-        idx = products_df.index[products_df['product_id'] == product_id][0]
-    except IndexError:
-        return f"❌ Product ID '{product_id}' not found in dataset."
-
-    # Get top N similar product indices and distances
-    distances, indices = model2.kneighbors(tfidf_matrix[idx], n_neighbors=top_n + 1)  # +1 to skip self
-    # Drop the first index (which is the product itself)
-    similar_indices = indices.flatten()[1:]
-    # Fetch recommended product info
-    valid_indices = [i for i in similar_indices if i < len(products_df)]
-
-    # Safely fetch recommended product info
-    recommendation = products_df.iloc[valid_indices].copy()
-    recommendation =recommendation.rename(columns={"rating": "EstimateScore"})
-    
-    recommendation = recommendation.sort_values(by='EstimateScore', ascending=False)
-    return recommendation
+content_based_filtering = recommender.content_based_filtering
 
 custom_info = f"""
     <div style="background-color: #e8f4fd; padding: 10px 12px; border-radius: 16px; margin-bottom: 20px">
@@ -161,15 +108,7 @@ st.markdown("---")
 product_names = products_df['product_name'].dropna().unique()
 
 
-top_users = (
-    user_rating_df['user']
-    .dropna()
-    .loc[~user_rating_df['user'].str.contains(r'\*', regex=True)]
-    .value_counts()
-    .head(100)
-    .index
-)
-users_name = top_users.tolist()
+users_name = leaderboard.top_names(100)
 
 if filtering_method == "🧠 Content-Based Filtering" or filtering_method == "🧠 Gợi ý dựa trên nội dung sản phẩm (Content-Based Filtering)":
     
@@ -284,24 +223,11 @@ else:
         )
 # 👇 Load the top 100 users based on selection mode
     if "Name" in selection_mode or "Tên" in selection_mode:
-        top_users = (
-            user_rating_df['user']
-            .dropna()
-            .loc[~user_rating_df['user'].str.contains(r'\*', regex=True)]
-            .value_counts()
-            .head(100)
-            .index
-        )
+        top_users = leaderboard.top_names(100)
     else:
-        top_users = (
-            user_rating_df['user_id']
-            .dropna()
-            .value_counts()
-            .head(100)
-            .index
-        )
+        top_users = leaderboard.top_user_ids(100)
 
-    users_name = top_users.tolist()
+    users_name = top_users
     with col2:
         selected_user = st.selectbox(
         label="User List" if language == "English" else "Danh sách người dùng",
@@ -312,47 +238,33 @@ else:
     
     if "Name" in selection_mode or "Tên" in selection_mode:
     # Map the selected name to the corresponding user_id(s) — take the most active one if duplicates
-        user_id = (
-            user_rating_df[user_rating_df['user'] == selected_user]
-            .groupby('user_id')
-            .size()
-            .sort_values(ascending=False)
-            .index[0]
-        )
+        user_id = leaderboard.most_active_user_id(selected_user)
     else:
         user_id = selected_user  # already a user_id
-    product_ids = (
-    user_rating_df[user_rating_df["user_id"] == user_id]
-    .drop_duplicates(keep="first")
-    .sort_values("rating")  # Now sorting works because 'rating' is present
-    .head(100)["product_id"]
-    .tolist()
-    )
+    # Up to 100 products the user rated, lowest rating first
+    product_ids = history_index.lowest_rated(user_id, 100)
 
     products = []
 
     # Load default image
     products = []
 
-    for x in product_ids:
-        product_row = products_df[products_df["product_id"] == x]
+    for product_row in product_index.lookup_many(product_ids).to_dict("records"):
+        # Extract image
+        image_url = product_row["image"]
         
-        if not product_row.empty:
-            # Extract image
-            image_url = product_row["image"].values[0]
-            
-            # Check for missing/NaN image
-            if not image_url or (isinstance(image_url, float) and math.isnan(image_url)):
-                image_url = f"data:image/jpg;base64,{image_base64}"
-
-            products.append({
-                "name": product_row["product_name"].values[0],
-                "price": product_row["price"].values[0],
-                "rating": product_row["rating"].values[0],
-                "image": image_url,
-                "category": product_row["sub_category"].values[0],
-                "product_url": product_row["link"].values[0],
-            })
+        # Check for missing/NaN image
+        if not image_url or (isinstance(image_url, float) and math.isnan(image_url)):
+            image_url = f"data:image/jpg;base64,{image_base64}"
+
+        products.append({
+            "name": product_row["product_name"],
+            "price": product_row["price"],
+            "rating": round(float(product_row["rating"]), 2),
+            "image": image_url,
+            "category": product_row["sub_category"],
+            "product_url": product_row["link"],
+        })
 
     # CSS for horizontal scrolling
     if language == "English":
@@ -452,8 +364,17 @@ if (filtering_method != "🧠 Content-Based Filtering" and filtering_method != "
 
 button_clicked = st.button("🔍 Generate Recommendations" if language == "English" else "🔍 Nhận các sản phẩm gợi ý", use_container_width=True)
 
-if button_clicked:
-    recommendations = content_based_filtering(product_id, num_products1) if (filtering_method == "🧠 Content-Based Filtering" or filtering_method == "🧠 Gợi ý dựa trên nội dung sản phẩm (Content-Based Filtering)") else collab_filtering(user_id, num_products2, selected_category)
+# Computed on button click, then kept for this session so paging does not re-score
+if (filtering_method == "🧠 Content-Based Filtering" or filtering_method == "🧠 Gợi ý dựa trên nội dung sản phẩm (Content-Based Filtering)"):
+    request = ("content", product_id, num_products1, None, content_version())
+    recommendations = session_recommendations(
+        request, button_clicked, lambda: content_based_filtering(product_id, num_products1))
+else:
+    request = recommender.collab_request(user_id, num_products2, selected_category, **COLLAB_OPTIONS)
+    recommendations = session_recommendations(
+        request, button_clicked, lambda: collab_filtering(user_id, num_products2, selected_category))
+
+if recommendations is not None:
 
     suggested_products = []
     for _, row in recommendations.iterrows():
@@ -463,7 +384,7 @@ if button_clicked:
                 "product_url": row.get("link", "https://example.com/product"),  # default if missing
                 "product_category": row["sub_category"],
                 "price": int(row.get("price", 0)),
-                "rating": float(row.get("EstimateScore", 0)),
+                "rating": round(float(row.get("EstimateScore", 0)), 2),
                 "description": row.get("description_clean", "No description available.")
             })
     content = selected_product if (filtering_method == "🧠 Content-Based Filtering" or filtering_method == "🧠 Gợi ý dựa trên nội dung sản phẩm (Content-Based Filtering)") else selected_user
@@ -0,0 +1,75 @@
+from data_store import get_product_index, get_products, positive_items
+from model_registry import (collaborative_version, fold_generation, get_catalog_blocks, get_content_index,
+                            get_mips_index, get_neighbour_table, get_tfidf_matrix)
+from stage_metrics import span
+
+# Recommendation functions behind the Streamlit pages, the HTTP service and batch jobs.
+# No Streamlit here: every table and model comes from the process-wide data_store and
+# model_registry, so they are loaded once whichever entry point runs first.
+
+
+# === 🤝 Collaborative filtering ===
+def collab_request(user_id, top_n=5, categories='All', include_unknown=False, use_mips=True):
+    """Cache key of ``collab_filtering`` with these arguments; the model version comes last."""
+    return ("collaborative", user_id, top_n, categories, include_unknown, use_mips, fold_generation(user_id),
+            collaborative_version())
+
+
+def collab_filtering(user_id, top_n=5, categories='All', include_unknown=False, use_mips=True):
+    """Top ``top_n`` catalog products for ``user_id`` by SVD estimate, with an ``EstimateScore`` column.
+
+    Products the user already rated 3 or higher, in the ratings file or the rating log,
+    are left out. ``include_unknown`` also ranks products the model never saw, ``use_mips``
+    lets "All" requests go through the MIPS index when CF_MIPS_PROBES enables it.
+    """
+    with span("collab.load"):
+        catalog_df, item_blocks = get_catalog_blocks(include_unknown)
+        mips_index = get_mips_index() if use_mips else None
+
+    # Get user history of positively rated items
+    with span("collab.history"):
+        exclude_ids = positive_items(user_id, min_rating=3)
+
+    # Score only the selected category's block (every block for "All") and keep the top N
+    with span("collab.score"):
+        top, scores = item_blocks.top_k(user_id, top_n, categories, exclude_ids=exclude_ids, mips_index=mips_index)
+
+    # Fetch product info for the winners only
+    with span("collab.merge"):
+        recommendations = catalog_df.iloc[top].reset_index(drop=True)
+        recommendations.insert(1, 'EstimateScore', scores.round(2))
+    return recommendations
+
+
+# === 🧠 Content-based filtering ===
+def content_based_filtering(product_id, top_n=5):
+    """Up to ``top_n`` products most similar to ``product_id``, best product rating first.
+
+    Returns an error message instead of a frame when the product is not in the catalog.
+    """
+    with span("content.load"):
+        products_df = get_products()
+        idx = get_product_index().position(product_id)
+    if idx < 0:
+        return f"❌ Product ID '{product_id}' not found in dataset."
+
+    # Get top N similar product indices and distances
+    with span("content.neighbours"):
+        neighbour_table = get_neighbour_table()
+        if idx >= get_tfidf_matrix().shape[0]:
+            # Appended to the products file, not vectorized yet (update_content_index.py)
+            similar_indices = []
+        elif neighbour_table is not None and top_n <= neighbour_table.width:
+            distances, similar_indices = neighbour_table.neighbours(idx, top_n)
+        else:
+            distances, indices = get_content_index().kneighbors(get_tfidf_matrix()[idx], n_neighbors=top_n + 1)  # +1 to skip self
+            # Drop the first index (which is the product itself)
+            similar_indices = indices.flatten()[1:]
+        valid_indices = [i for i in similar_indices if 0 <= i < len(products_df)]
+
+    # Safely fetch recommended product info
+    with span("content.merge"):
+        recommendation = products_df.iloc[valid_indices].copy()
+        recommendation = recommendation.rename(columns={"rating": "EstimateScore"})
+    with span("content.sort"):
+        return recommendation.sort_values(by='EstimateScore', ascending=False)
@@ -0,0 +1,125 @@
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+# Off unless PROFILE_RERUNS (or the ?profile= query parameter) names a mode:
+#   cprofile  one .prof file per rerun (snakeviz, `python -m pstats`)
+#   sample    one .collapsed file per rerun: folded stacks for flamegraph.pl / speedscope
+PROFILE_MODES = ("cprofile", "sample")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 200))
+SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_MS", 5)) / 1000
+
+
+def profile_mode(query_value=None):
+    """The profiling mode requested for this rerun, None when profiling is off."""
+    mode = query_value or os.environ.get("PROFILE_RERUNS")
+    if mode in ("1", "true"):
+        return "cprofile"
+    return mode if mode in PROFILE_MODES else None
+
+
+class _StackSampler:
+    """Counts the stacks of one thread, sampled every ``interval`` seconds from a helper thread."""
+
+    def __init__(self, thread_id, base_depth, interval):
+        self.thread_id = thread_id
+        self.base_depth = base_depth  # frames above the profiled block, left out of every stack
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rerun-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.reverse()
+            if len(stack) > self.base_depth:
+                self.stacks[";".join(stack[self.base_depth:])] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RerunProfiler:
+    """Profile the ``with`` block into ``directory`` as ``<time>_<page>_<session>.prof|.collapsed``.
+
+    A no-op when ``mode`` is None. Only the newest ``max_files`` profiles are kept. With
+    cProfile, a rerun that starts while another session's is still being profiled (one
+    profiler per process on Python 3.12+) runs unprofiled.
+    """
+
+    def __init__(self, mode, page, session, directory=PROFILE_DIR, max_files=PROFILE_MAX_FILES):
+        self.mode = mode
+        self.directory = directory
+        self.max_files = max_files
+        tag = re.sub(r"[^\w.-]+", "-", f"{page}_{session}").strip("-")
+        now = time.time()
+        self.name = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000) % 1000:03d}_{tag}"
+        self._profiler = None
+
+    def __enter__(self):
+        if self.mode == "cprofile":
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # another profiler is active
+                return self
+            self._profiler = profiler
+        elif self.mode == "sample":
+            base_depth, frame = 0, sys._getframe(1)
+            while frame is not None:
+                base_depth, frame = base_depth + 1, frame.f_back
+            self._profiler = _StackSampler(threading.get_ident(), base_depth - 1, SAMPLE_INTERVAL)
+            self._profiler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        # Also runs when the page stops early (st.rerun, st.stop), which raise through here
+        profiler, self._profiler = self._profiler, None
+        if profiler is None:
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        if self.mode == "cprofile":
+            profiler.disable()
+            profiler.dump_stats(os.path.join(self.directory, f"{self.name}.prof"))
+        else:
+            profiler.stop()
+            profiler.write(os.path.join(self.directory, f"{self.name}.collapsed"))
+        _rotate(self.directory, self.max_files)
+        return False
+
+
+def _rotate(directory, max_files):
+    # Oldest profiles first; other sessions may be rotating at the same time
+    profiles = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith((".prof", ".collapsed")):
+            try:
+                profiles.append((entry.stat().st_mtime_ns, entry.path))
+            except FileNotFoundError:
+                pass
+    profiles.sort()
+    for _, path in profiles[:max(0, len(profiles) - max_files)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
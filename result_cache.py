@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+from data_store import freeze_frame
+
+
+# === 🌐 Process-wide recommendation cache ===
+class RecommendationCache:
+    """Bounded LRU with a TTL, shared by every session of the process.
+
+    Keys are the session ``request`` tuples: ``(method, ..., model version)``. When a
+    method shows up with a new model version, entries of its old version are dropped
+    (counted as invalidations), so results never outlive the artifact they came from.
+    Values are frozen frames, since every session reads the same object.
+    """
+
+    def __init__(self, maxsize=1024, ttl=600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # request -> (expires_at, result), least recently used first
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def _invalidate_old_versions(self, request):
+        method, version = request[0], request[-1]
+        if self._versions.get(method) == version:
+            return
+        stale = [key for key in self._entries if key[0] == method and key[-1] != version]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+        self._versions[method] = version
+
+    def get(self, request):
+        with self._lock:
+            self._invalidate_old_versions(request)
+            entry = self._entries.get(request)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[request]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(request)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, request, result):
+        with self._lock:
+            self._invalidate_old_versions(request)
+            self._entries[request] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(request)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, request, compute):
+        result = self.get(request)
+        if result is None:
+            # Computed outside the lock: other sessions keep reading while this one scores
+            result = freeze_frame(compute())
+            self.put(request, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries), "maxsize": self.maxsize, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "expirations": self.expirations, "invalidations": self.invalidations,
+            }
+
+
+# Sized by RECOMMENDATION_CACHE_SIZE (entries, 0 disables) and RECOMMENDATION_CACHE_TTL (seconds)
+shared_cache = RecommendationCache(
+    maxsize=int(os.environ.get("RECOMMENDATION_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("RECOMMENDATION_CACHE_TTL", 600)),
+)
+
+
+def cache_stats():
+    return shared_cache.stats()
+
+
+# === 🗃️ Per-session recommendation results ===
+# Results are only computed when "Generate" is clicked. Every other widget change
+# (paging, language, ...) reruns the page with the button False, so the last result
+# is kept in st.session_state and shown again without re-scoring the catalog.
+SESSION_RESULTS_KEY = "recommendation_results"
+SESSION_SHOWN_KEY = "recommendation_shown"
+MAX_SESSION_RESULTS = 16
+
+
+def session_recommendations(request, button_clicked, compute):
+    """Recommendations for ``request`` in this session, None when there is nothing to show.
+
+    ``request`` is the hashable (method, user_id/product_id, top_n, category, ..., model version)
+    key, with every option that changes the result (see ``recommender.collab_request``).
+    A click takes the result from this session, then from ``shared_cache``, and only
+    computes it when neither has it; it becomes the one on screen, and later reruns with
+    the same ``request`` get it back from the session.
+    """
+    results = st.session_state.setdefault(SESSION_RESULTS_KEY, {})
+    if not button_clicked and st.session_state.get(SESSION_SHOWN_KEY) != request:
+        return None
+
+    if request not in results:
+        results[request] = shared_cache.get_or_compute(request, compute)
+        while len(results) > MAX_SESSION_RESULTS:
+            results.pop(next(iter(results)))  # oldest request first
+    st.session_state[SESSION_SHOWN_KEY] = request
+    return results[request]
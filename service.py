@@ -0,0 +1,222 @@
+"""Headless JSON recommendation service (asyncio, standard library only).
+
+    python service.py --host 127.0.0.1 --port 8000
+
+Endpoints:
+    GET  /health
+    GET  /stats                                  cache counters and loaded artifacts
+    GET  /metrics                                per-stage latency histograms, Prometheus text format
+    GET  /recommend/collaborative?user_id=&top_n=&category=
+    GET  /recommend/content?product_id=&top_n=
+    POST /recommend/collaborative/batch          {"user_ids": [...], "top_n": 5, "category": "All"}
+    POST /recommend/content/batch                {"product_ids": [...], "top_n": 5}
+    POST /ratings                                {"user_id": 1, "ratings": [{"product_id": 2, "rating": 5}], "user": "name"}
+                                                 appended to the rating log and folded into the user's factors
+
+Models and tables are loaded once at startup; requests share the process-wide result
+cache with the Streamlit pages. Scoring runs in a thread pool so the event loop keeps
+accepting connections while NumPy works.
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import recommender
+from data_store import append_ratings, get_history_index, get_product_index, get_products, get_ratings
+from model_registry import (content_version, fold_in_user, get_catalog_blocks, get_content_index,
+                            get_mips_index, get_neighbour_table, get_tfidf_matrix, loaded_artifacts)
+from result_cache import cache_stats, shared_cache
+from stage_metrics import prometheus_text
+
+MAX_BATCH = 1000
+MAX_TOP_N = 100
+MAX_BODY_BYTES = 1 << 20
+
+
+class BadRequest(ValueError):
+    pass
+
+
+# === 🧮 Recommendations as JSON records ===
+def _records(recommendations):
+    # NaN -> null, NumPy scalars -> plain JSON numbers
+    return json.loads(recommendations.to_json(orient="records", force_ascii=False))
+
+
+def collaborative(user_id, top_n, category):
+    request = recommender.collab_request(user_id, top_n, category)
+    result = shared_cache.get_or_compute(request, lambda: recommender.collab_filtering(user_id, top_n, category))
+    return {"user_id": user_id, "recommendations": _records(result)}
+
+
+def content(product_id, top_n):
+    if get_product_index().position(product_id) < 0:
+        return {"product_id": product_id, "error": f"Product ID '{product_id}' not found in dataset."}
+    request = ("content", product_id, top_n, None, content_version())
+    result = shared_cache.get_or_compute(request, lambda: recommender.content_based_filtering(product_id, top_n))
+    return {"product_id": product_id, "recommendations": _records(result)}
+
+
+def log_ratings(user_id, ratings, user_name):
+    append_ratings((user_id, product_id, rating, user_name) for product_id, rating in ratings)
+    return {"user_id": user_id, "logged": len(ratings), "folded_in": fold_in_user(user_id)}
+
+
+def warm_up():
+    """Load every table and model before the first request."""
+    get_ratings(), get_products(), get_product_index(), get_history_index()
+    get_catalog_blocks(), get_mips_index()
+    get_tfidf_matrix(), get_content_index(), get_neighbour_table()
+
+
+# === 🧾 Request parsing ===
+def _int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise BadRequest(f"'{name}' must be an integer")
+
+
+def _top_n(value):
+    top_n = _int(value, "top_n")
+    if not 1 <= top_n <= MAX_TOP_N:
+        raise BadRequest(f"'top_n' must be between 1 and {MAX_TOP_N}")
+    return top_n
+
+
+def _ids(body, name):
+    ids = body.get(name)
+    if not isinstance(ids, list) or not ids:
+        raise BadRequest(f"'{name}' must be a non-empty list")
+    if len(ids) > MAX_BATCH:
+        raise BadRequest(f"At most {MAX_BATCH} ids per batch")
+    return [_int(i, name) for i in ids]
+
+
+def _ratings(body):
+    ratings = body.get("ratings")
+    if not isinstance(ratings, list) or not ratings or not all(isinstance(r, dict) for r in ratings):
+        raise BadRequest("'ratings' must be a non-empty list of {\"product_id\", \"rating\"} objects")
+    if len(ratings) > MAX_BATCH:
+        raise BadRequest(f"At most {MAX_BATCH} ratings per request")
+    parsed = [(_int(r.get("product_id"), "product_id"), _int(r.get("rating"), "rating")) for r in ratings]
+    if not all(1 <= rating <= 5 for _, rating in parsed):
+        raise BadRequest("'rating' must be between 1 and 5")
+    return parsed
+
+
+def route(method, path, query, body):
+    """(status, payload) of one request; runs in the worker pool. Text payloads are sent as plain text."""
+    if method == "GET" and path == "/health":
+        return HTTPStatus.OK, {"status": "ok"}
+    if method == "GET" and path == "/stats":
+        return HTTPStatus.OK, {"cache": cache_stats(), "artifacts": loaded_artifacts()}
+    if method == "GET" and path == "/metrics":
+        return HTTPStatus.OK, prometheus_text()
+
+    if method == "GET" and path == "/recommend/collaborative":
+        user_id = _int(query.get("user_id"), "user_id")
+        return HTTPStatus.OK, collaborative(user_id, _top_n(query.get("top_n", 5)), query.get("category", "All"))
+    if method == "GET" and path == "/recommend/content":
+        result = content(_int(query.get("product_id"), "product_id"), _top_n(query.get("top_n", 5)))
+        return (HTTPStatus.NOT_FOUND if "error" in result else HTTPStatus.OK), result
+
+    if method == "POST" and path == "/recommend/collaborative/batch":
+        top_n = _top_n(body.get("top_n", 5))
+        category = body.get("category", "All")
+        return HTTPStatus.OK, {"results": [collaborative(u, top_n, category) for u in _ids(body, "user_ids")]}
+    if method == "POST" and path == "/recommend/content/batch":
+        top_n = _top_n(body.get("top_n", 5))
+        return HTTPStatus.OK, {"results": [content(p, top_n) for p in _ids(body, "product_ids")]}
+    if method == "POST" and path == "/ratings":
+        user_id = _int(body.get("user_id"), "user_id")
+        user_name = body.get("user") or get_history_index().user_name(user_id) or ""
+        return HTTPStatus.OK, log_ratings(user_id, _ratings(body), str(user_name))
+
+    return HTTPStatus.NOT_FOUND, {"error": f"No route for {method} {path}"}
+
+
+# === 🌐 HTTP/1.1 on asyncio streams ===
+class RecommendationServer:
+    def __init__(self, workers=4):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="recommend")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                status, payload = await self.respond(request_line, headers, reader)
+                # A rejected body was never read, so the stream cannot be reused
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and status != HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+                if isinstance(payload, str):
+                    body, content_type = payload.encode(), "text/plain; version=0.0.4; charset=utf-8"
+                else:
+                    body, content_type = json.dumps(payload, ensure_ascii=False).encode(), "application/json; charset=utf-8"
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, request_line, headers, reader):
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY_BYTES:
+                return HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Request body too large"}
+            raw = await reader.readexactly(length) if length else b""
+            body = json.loads(raw) if raw else {}
+            if not isinstance(body, dict):
+                raise BadRequest("Request body must be a JSON object")
+        except (ValueError, UnicodeDecodeError) as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e) or "Malformed request"}
+
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executor, route, method, url.path, query, body)
+        except BadRequest as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        except Exception as e:  # keep serving other requests
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+
+
+async def serve(host, port, workers):
+    server = await asyncio.start_server(RecommendationServer(workers).handle, host, port)
+    print(f"Serving recommendations on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSON recommendation service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=4, help="Threads scoring requests")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    warm_up()
+    print(f"Loaded {', '.join(loaded_artifacts())} in {time.perf_counter() - start:.1f}s")
+    asyncio.run(serve(args.host, args.port, args.workers))
@@ -0,0 +1,100 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Where main.py writes the Prometheus text after every rerun (e.g. for node_exporter's
+# textfile collector); the service serves the same text at GET /metrics
+METRICS_FILE_ENV = "STAGE_METRICS_FILE"
+
+# Upper bounds in seconds, Prometheus' default latency buckets plus 1 ms
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# === ⏱️ Cumulative per-stage histograms, shared by the whole process ===
+class StageHistograms:
+    """Latency histogram per stage name, in the cumulative form Prometheus expects."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._stages = {}  # stage -> [per-bucket counts (last one is +Inf), sum of seconds]
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = self._stages[stage] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][bisect.bisect_left(self.buckets, seconds)] += 1
+            entry[1] += seconds
+
+    def snapshot(self):
+        """{stage: (cumulative counts per bucket, +Inf last), sum)}."""
+        with self._lock:
+            stages = {stage: (list(counts), total) for stage, (counts, total) in self._stages.items()}
+        return {stage: ([sum(counts[:i + 1]) for i in range(len(counts))], total)
+                for stage, (counts, total) in stages.items()}
+
+    def clear(self):
+        with self._lock:
+            self._stages.clear()
+
+    def prometheus_text(self, name="recommender_stage_seconds"):
+        lines = [f"# HELP {name} Time spent in each recommendation stage.", f"# TYPE {name} histogram"]
+        bounds = [repr(float(b)) for b in self.buckets] + ["+Inf"]
+        for stage, (cumulative, total) in sorted(self.snapshot().items()):
+            for bound, count in zip(bounds, cumulative):
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {cumulative[-1]}')
+        return "\n".join(lines) + "\n"
+
+
+stage_histograms = StageHistograms()
+
+# Spans of the current Streamlit rerun; one script thread per rerun, and only threads that
+# called start_trace() keep a list, so service worker threads never accumulate one
+_local = threading.local()
+
+
+def record(stage, seconds):
+    """Add one timing of ``stage`` to the histograms and to the current rerun's trace."""
+    stage_histograms.observe(stage, seconds)
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.append((stage, seconds))
+
+
+@contextmanager
+def span(stage):
+    """Time the ``with`` block as ``stage``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def start_trace():
+    _local.trace = []
+
+
+def current_trace():
+    """[(stage, seconds)] recorded since start_trace() on this thread, in completion order."""
+    return list(getattr(_local, "trace", None) or [])
+
+
+def prometheus_text():
+    return stage_histograms.prometheus_text()
+
+
+def export_metrics(path=None):
+    """Write prometheus_text() to ``path`` (default $STAGE_METRICS_FILE) atomically; no-op when unset."""
+    path = path or os.environ.get(METRICS_FILE_ENV)
+    if not path:
+        return
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"  # sessions export concurrently
+    with open(tmp_path, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
@@ -0,0 +1,36 @@
+import argparse
+import time
+
+from mf_trainer import SOLVERS, ALSTrainer, save_surprise, to_surprise, training_ratings
+from model_registry import SURPRISE_MODEL_FILE
+
+# Offline step: retrain the collaborative model from the ratings table with multi-threaded
+# ALS instead of surprise's single-threaded SGD. Writes a surprise.pkl the pages load as
+# before; running apps pick it up on their next request. Re-run export_factors.py after
+# it when SVD_FACTORS_DIR is in use.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the biased matrix factorisation model with ALS")
+    parser.add_argument("--out", default=SURPRISE_MODEL_FILE)
+    parser.add_argument("--factors", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=15)
+    parser.add_argument("--reg", type=float, default=0.05)
+    parser.add_argument("--solver", choices=SOLVERS, default="als")
+    parser.add_argument("--cg-steps", type=int, default=3, help="Conjugate-gradient steps per sweep (--solver cg)")
+    parser.add_argument("--threads", type=int, help="Default: every core")
+    parser.add_argument("--include-log", action="store_true", help="Also train on the rating log (ratings_log.csv)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    matrix = training_ratings(args.include_log)
+    print(f"Read {matrix.n_ratings} ratings of {len(matrix.user_ids)} users and {len(matrix.item_ids)} products "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    trainer = ALSTrainer(args.factors, args.iterations, args.reg, solver=args.solver, cg_steps=args.cg_steps,
+                         n_threads=args.threads, seed=args.seed)
+    start = time.perf_counter()
+    scorer = trainer.fit(matrix, lambda i, rmse, seconds: print(f"iteration {i + 1:>3}  train RMSE {rmse:.4f}  {seconds:.2f}s"))
+    print(f"Trained on {trainer.n_threads} threads in {time.perf_counter() - start:.1f}s")
+
+    save_surprise(to_surprise(scorer, matrix, args.iterations, args.reg), args.out)
+    print(f"Wrote {args.out}")
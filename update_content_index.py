@@ -0,0 +1,112 @@
+import argparse
+import os
+import pickle
+import time
+
+import scipy.sparse
+
+from content_engine import (CONTENT_TEXT_COLUMN, HASHING_STATE_FILE, NEIGHBOUR_INDICES_FILE, HashingTfidf,
+                            build_neighbour_table, extend_neighbour_table, load_neighbour_table,
+                            save_neighbour_table)
+from data_store import load_products
+from model_registry import CONTENT_MODEL_FILE, TFIDF_MATRIX_FILE
+
+
+def _texts(products):
+    return products[CONTENT_TEXT_COLUMN].fillna("").astype(str)
+
+
+def save_matrix(matrix, path=TFIDF_MATRIX_FILE):
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    scipy.sparse.save_npz(tmp_path, matrix)
+    os.replace(tmp_path, path)
+
+
+def refit_content_model(matrix, path=CONTENT_MODEL_FILE):
+    # Same estimator and parameters as the current gensim.pkl (a brute-force cosine
+    # NearestNeighbors when there is none), fitted on every row of the matrix
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            model = pickle.load(f)
+    else:
+        from sklearn.neighbors import NearestNeighbors
+        model = NearestNeighbors(metric='cosine', algorithm='brute')
+    model.fit(matrix)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(model, f)
+    os.replace(tmp_path, path)
+
+
+def full_rebuild(products, n_neighbors):
+    vectorizer = HashingTfidf()
+    matrix = vectorizer.fit_transform(_texts(products))
+    refit_content_model(matrix)
+    save_matrix(matrix)
+    if n_neighbors:
+        save_neighbour_table(*build_neighbour_table(matrix, n_neighbors))
+    vectorizer.save()
+    return matrix.shape[0]
+
+
+def append_new_products(products):
+    """Vectorize the products past the last committed row; returns how many were added.
+
+    tfidf_hashing.npz is written last and marks what a run committed. Rows of the matrix
+    past its document count were written by an interrupted run: they are vectorized again
+    as one batch, as that run did, so they come out the same and a neighbour table it
+    already extended to them stays valid. The products after them follow as a second batch.
+    """
+    try:
+        vectorizer = HashingTfidf.load()
+    except FileNotFoundError:
+        raise SystemExit(f"No {HASHING_STATE_FILE}: run with --full once first")
+    matrix = scipy.sparse.load_npz(TFIDF_MATRIX_FILE).tocsr()
+    n_old, n_interrupted = vectorizer.n_docs, matrix.shape[0]
+    if matrix.shape[1] != vectorizer.n_features or not n_old <= n_interrupted <= len(products):
+        raise SystemExit(f"{TFIDF_MATRIX_FILE} does not match {HASHING_STATE_FILE} and the products file: "
+                         f"run with --full")
+    if len(products) == n_old:
+        return 0
+
+    texts = _texts(products)
+    blocks = [matrix[:n_old]]
+    for start, stop in ((n_old, n_interrupted), (n_interrupted, len(products))):
+        if stop > start:
+            blocks.append(vectorizer.append(texts.iloc[start:stop]))
+    matrix = scipy.sparse.vstack(blocks).tocsr()
+    table = load_neighbour_table(".")
+    if table is not None and len(table) not in (n_old, n_interrupted):
+        table = None
+    if table is None and os.path.exists(NEIGHBOUR_INDICES_FILE):
+        raise SystemExit(f"The neighbour table does not match {HASHING_STATE_FILE}: run with --full")
+    refit_content_model(matrix)
+    save_matrix(matrix)
+    if table is not None:
+        save_neighbour_table(*extend_neighbour_table(table.indices, table.distances, matrix))
+    vectorizer.save()
+    return len(products) - n_old
+
+
+# Offline step: keep tfidf_matrix.npz, gensim.pkl and the neighbour table in step with the
+# products file without refitting a vocabulary. By default only the products appended since
+# the last run are vectorized (hashed terms, running document frequencies) and added to all
+# three; running apps pick them up on their next request. --full re-vectorizes every product,
+# correcting the idf drift of rows added since: run it once before the first incremental
+# update, then periodically.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add new products to the content-based index, or rebuild it")
+    parser.add_argument("--full", action="store_true", help="Re-vectorize every product and rebuild the index")
+    parser.add_argument("--neighbours", type=int, default=50, help="Neighbour table width for --full (0: none)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    products = load_products()
+    if args.full:
+        n_rows = full_rebuild(products, args.neighbours)
+        print(f"Rebuilt the content index for {n_rows} products in {time.perf_counter() - start:.1f}s")
+    else:
+        n_added = append_new_products(products)
+        vectorizer = HashingTfidf.load()
+        print(f"Added {n_added} products in {time.perf_counter() - start:.1f}s; "
+              f"{vectorizer.n_docs - vectorizer.n_docs_at_rebuild} added since the last full rebuild")